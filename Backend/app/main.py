@@ -1,14 +1,54 @@
 from Backend.app.routers import admin
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
 from Backend.app.database import engine, Base
 from Backend.app.routers import patients
+from Backend.app.services import providers
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+IMAGE_GC_INTERVAL = float(os.getenv("IMAGE_GC_INTERVAL", "3600"))
+
+
+async def _image_gc_loop():
+    while True:
+        await asyncio.sleep(IMAGE_GC_INTERVAL)
+        try:
+            await asyncio.to_thread(providers.get_image_store().collect_garbage)
+        except Exception as e:
+            logger.error(f"Image store sweep failed: {e}")
+        try:
+            await asyncio.to_thread(providers.get_resumable_uploads().expire)
+        except Exception as e:
+            logger.error(f"Upload session expiry failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    # Calibrating the hasher runs bcrypt; do it before the model load competes for the CPU
+    await run_in_threadpool(providers.get_password_hasher)
+    # Load and warm the model without holding up startup; /ready reports when it's done
+    warm_up = asyncio.create_task(asyncio.to_thread(providers.warm_up))
+    image_gc = asyncio.create_task(_image_gc_loop())
+    yield
+    warm_up.cancel()
+    image_gc.cancel()
+    pdf_service = providers.loaded("pdf")
+    if pdf_service:
+        pdf_service.close()
 
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="FastAPI PostgreSQL Demo",
     description="Learning FastAPI with proper structure",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(patients.router)
@@ -29,4 +69,48 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    # Liveness only; dependency checks live in /ready
+    return {"status": "healthy"}
+
+def _database_status():
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return {"status": "unavailable", "error": str(e)}
+
+    pool = engine.pool
+    return {
+        "status": "connected",
+        "pool": {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    }
+
+def _llm_status():
+    explanation_service = providers.loaded("explanation")
+    if explanation_service is None:
+        return {"status": "not_loaded"}
+    # Without an API key uploads still work with template explanations
+    if explanation_service.client is None:
+        return {"status": "template_only"}
+    return {"status": "configured", "circuit": explanation_service.client.breaker.state}
+
+@app.get("/ready")
+def readiness_check(response: Response):
+    model = providers.model_status()
+    database = _database_status()
+    llm = _llm_status()
+
+    ready = model["status"] == "ready" and database["status"] == "connected"
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "status": "ready" if ready else "not_ready",
+        "model": model,
+        "database": database,
+        "llm": llm
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,7 @@ class Patient(Base):
     
     images = relationship("PatientImage", back_populates="patient", cascade="all, delete-orphan")
     reports = relationship("PatientReport", back_populates="patient", cascade="all, delete-orphan")
+    upload_sessions = relationship("UploadSession", back_populates="patient", cascade="all, delete-orphan")
 
     def set_password(self, plain_password: str):
         self.password = get_password_hash(plain_password)
@@ -59,6 +60,75 @@ class ImageAnalysis(Base):
     
     image = relationship("PatientImage", back_populates="analysis")
     report = relationship("PatientReport", back_populates="analysis", uselist=False, cascade="all, delete-orphan")
+    job = relationship("AnalysisJob", back_populates="analysis", uselist=False, cascade="all, delete-orphan")
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String, unique=True, index=True, nullable=False)
+    analysis_id = Column(Integer, ForeignKey("image_analyses.id"), nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    stage = Column(String)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    analysis = relationship("ImageAnalysis", back_populates="job")
+
+
+class ImageBlob(Base):
+    """One stored image file, shared by every PatientImage with the same content."""
+    __tablename__ = "image_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)
+    file_path = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    mime_type = Column(String, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class UploadSession(Base):
+    """A resumable upload in progress; `received` is how many leading bytes are on disk."""
+    __tablename__ = "upload_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    uuid = Column(String, unique=True, index=True, nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    original_name = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    received = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default="open")  # open, complete
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    patient = relationship("Patient", back_populates="upload_sessions")
+
+
+class CachedAnalysis(Base):
+    __tablename__ = "analysis_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "model_name", name="uq_analysis_cache_hash_model"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), index=True, nullable=False)
+    model_name = Column(String, nullable=False)
+    prediction = Column(String, nullable=False)
+    confidence = Column(Float, nullable=False)
+    all_probabilities = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CachedExplanation(Base):
+    __tablename__ = "explanation_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True, nullable=False)
+    explanation = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class PatientReport(Base):
@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException , status 
-from sqlalchemy.orm import Session
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException , status 
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from Backend.app.models.patient import Patient
+from Backend.app.models.patient import Patient, PatientImage, ImageAnalysis
 from Backend.app.models.admin import Admin
-from Backend.app.database import get_db
+from Backend.app.database import SessionLocal, get_db
 from Backend.app.schemas.admin import AdminLogin
-from Backend.app.utils.utils import create_access_token, verify_password , verify_token
+from Backend.app.utils.utils import create_access_token, password_needs_rehash
 from Backend.app.schemas.patients import PatientResponse
+from Backend.app.services import providers
+from Backend.app.services.export_service import stream_zip
+from Backend.app.services.password_service import HashingBusy
+from Backend.app.services.principal_service import Principal
+from Backend.app.routers.patients import report_pdf
+from datetime import datetime, timezone
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin" , tags=["Admin"])
 
@@ -16,8 +30,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/admin/login/form", scheme_name="
 def get_current_admin(
     token: str = Depends(oauth2_scheme),  
     db: Session = Depends(get_db)
-):
-    payload = verify_token(token)
+) -> Principal:
+    principals = providers.get_principal_cache()
+    payload = principals.decode(token)
     if not payload:
         raise HTTPException(
             status_code=401,
@@ -25,29 +40,46 @@ def get_current_admin(
         )
     
     username = payload.get("sub")
-    admin = db.query(Admin).filter(Admin.username == username).first()
-    
-    if not admin:
-        raise HTTPException(
-            status_code=401,
-            detail="Admin not found"
-        )
+    admin = principals.get("admin", username)
+    if admin is None:
+        row = db.query(Admin).filter(Admin.username == username).first()
+        if not row:
+            raise HTTPException(
+                status_code=401,
+                detail="Admin not found"
+            )
+        admin = principals.put("admin", row)
     
     return admin
 
+async def _authenticate(db: Session, background_tasks: BackgroundTasks, username: str, password: str) -> Admin:
+    # Same flow as patient logins: bcrypt on the password pool, unknown names included
+    def lookup():
+        try:
+            return db.query(Admin).filter(Admin.username == username).one_or_none()
+        finally:
+            db.close()
+    admin = await run_in_threadpool(lookup)
+
+    hasher = await run_in_threadpool(providers.get_password_hasher)
+    try:
+        if admin is None:
+            await hasher.reject_unknown(password)
+            valid = False
+        else:
+            valid = await hasher.verify(password, admin.password)
+    except HashingBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    if not valid:
+        raise HTTPException(status_code=401, detail="incorrect username or password")
+    if password_needs_rehash(admin.password):
+        background_tasks.add_task(hasher.upgrade, Admin, admin.id, password)
+    return admin
+
 @router.post("/login")
-def login_admin(login_data : AdminLogin , db : Session = Depends(get_db)):
-    admin = db.query(Admin).filter(Admin.username == login_data.username).one_or_none()
-    if not admin:
-        raise HTTPException(
-            status_code=401,
-            detail="incorrect username or passowrd"
-        )
-    if not verify_password(login_data.password, admin.password):
-        raise HTTPException(
-            status_code=401,
-            detail= "incorrect username or password"
-        )
+async def login_admin(login_data : AdminLogin , background_tasks: BackgroundTasks, db : Session = Depends(get_db)):
+    admin = await _authenticate(db, background_tasks, login_data.username, login_data.password)
     access_token = create_access_token(
     data={"sub": admin.username}
     )
@@ -58,12 +90,8 @@ def login_admin(login_data : AdminLogin , db : Session = Depends(get_db)):
     }
 
 @router.post("/login/form")
-def login_admin_form(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    admin = db.query(Admin).filter(Admin.username == form_data.username).one_or_none()
-    if not admin:
-        raise HTTPException(status_code=401, detail="incorrect username or password")
-    if not verify_password(form_data.password, admin.password):
-        raise HTTPException(status_code=401, detail="incorrect username or password")
+async def login_admin_form(background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    admin = await _authenticate(db, background_tasks, form_data.username, form_data.password)
     access_token = create_access_token(data={"sub": admin.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -72,7 +100,7 @@ def read_patients(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     patients = db.query(Patient).offset(skip).limit(limit).all()
     return patients
@@ -81,7 +109,7 @@ def read_patients(
 def delete_patient(
     patient_id: int,
     db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     
     patient = db.query(Patient).filter(Patient.id == patient_id).first()
@@ -91,6 +119,10 @@ def delete_patient(
             detail="Patient not found"
         )
 
+    # Blobs shared with other patients stay; unreferenced ones go in the next sweep
+    providers.get_image_store().release(db, [image.file_path for image in patient.images])
+    # Committing evicts the cached principal, so their tokens stop working at once on this
+    # worker; other workers drop it within its TTL
     db.delete(patient)
     db.commit()
     return None
@@ -100,7 +132,7 @@ def delete_patient(
 def get_patient_images(
     patient_id: int,
     db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     patient = db.query(Patient).filter(Patient.id == patient_id).first()
     if not patient:
@@ -118,3 +150,176 @@ def get_patient_images(
     return {"patient_id": patient_id, "images": images}
 
 
+EXPORT_PAGE_SIZE = 100
+
+
+def _export_page(db: Session, image_ids: list) -> list:
+    # The previous page is done with; drop it from the identity map
+    db.expunge_all()
+    return db.query(PatientImage).filter(PatientImage.id.in_(image_ids)).order_by(
+        PatientImage.uploaded_at, PatientImage.id
+    ).options(
+        selectinload(PatientImage.analysis).selectinload(ImageAnalysis.report)
+    ).all()
+
+
+def _export_entries(patient_id: int, patient_name: str, manifest: dict):
+    """Yield zip entries for every image and report of a patient, filling in `manifest` as it goes."""
+    db = SessionLocal()
+    try:
+        image_ids = [image_id for (image_id,) in db.query(PatientImage.id).filter(
+            PatientImage.patient_id == patient_id
+        ).order_by(PatientImage.uploaded_at, PatientImage.id)]
+        
+        # A page of rows (with their analyses and reports) in memory at a time; yield_per
+        # can't be combined with the selectin loads
+        images = (
+            image
+            for start in range(0, len(image_ids), EXPORT_PAGE_SIZE)
+            for image in _export_page(db, image_ids[start:start + EXPORT_PAGE_SIZE])
+        )
+        for image in images:
+            entry = {
+                "id": image.uuid,
+                "original_name": image.original_name,
+                "uploaded_at": image.uploaded_at.isoformat(),
+                "size": image.file_size,
+                "mime_type": image.mime_type,
+                "file": None,
+                "analysis": None
+            }
+            manifest["images"].append(entry)
+            
+            if os.path.exists(image.file_path):
+                entry["file"] = f"images/{image.filename}"
+                yield entry["file"], image.file_path, image.uploaded_at
+            else:
+                manifest["missing"].append(image.file_path)
+            
+            analysis = image.analysis
+            if not analysis:
+                continue
+            entry["analysis"] = {
+                "id": analysis.uuid,
+                "prediction": analysis.prediction,
+                "confidence": analysis.confidence,
+                "analyzed_at": analysis.analyzed_at.isoformat(),
+                "report": None
+            }
+            report = analysis.report
+            if not report:
+                continue
+            
+            report_entry = entry["analysis"]["report"] = {
+                "id": report.uuid,
+                "risk_level": report.risk_level,
+                "generated_at": report.generated_at.isoformat(),
+                "file": f"reports/report_{analysis.uuid}.pdf"
+            }
+            try:
+                # Lazily rendered reports are rendered now; one PDF in memory at a time at most
+                pdf_path, pdf_bytes = report_pdf(analysis, report, patient_name)
+            except Exception as e:
+                logger.error(f"Export of report {report.uuid} failed: {e}")
+                report_entry["file"] = None
+                manifest["missing"].append(report.pdf_path)
+                continue
+            yield report_entry["file"], pdf_bytes if pdf_bytes is not None else pdf_path, report.generated_at
+        
+        manifest["image_count"] = len(manifest["images"])
+        yield "manifest.json", json.dumps(manifest, indent=2).encode(), datetime.now()
+    finally:
+        db.close()
+
+
+@router.get("/patients/{patient_id}/export")
+def export_patient_records(
+    patient_id: int,
+    db: Session = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    """Stream a zip of a patient's original images and report PDFs plus a manifest.json.
+    
+    The archive is built while it is sent, so memory use doesn't grow with
+    the size of the patient's records.
+    """
+    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    manifest = {
+        "patient": {
+            "id": patient.id,
+            "username": patient.username,
+            "email": patient.email,
+            "created_at": patient.created_at.isoformat() if patient.created_at else None
+        },
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "exported_by": current_admin.username,
+        "images": [],
+        "missing": []
+    }
+    
+    return StreamingResponse(
+        stream_zip(_export_entries(patient.id, patient.username, manifest)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="patient_{patient.id}_export.zip"'}
+    )
+
+
+@router.get("/metrics")
+def get_metrics(current_admin: Principal = Depends(get_current_admin)):
+    # Only report services this worker has built; don't load the model for metrics
+    metrics = {"model": providers.model_status()}
+    vision_service = providers.loaded("vision")
+    if vision_service:
+        metrics["vision"] = vision_service.stats()
+    admission = providers.loaded("admission")
+    if admission:
+        # Its state belongs to the event loop; read it there rather than from this thread
+        metrics["admission"] = from_thread.run_sync(admission.stats)
+    analysis_cache = providers.loaded("analysis_cache")
+    if analysis_cache:
+        metrics["analysis_cache"] = analysis_cache.stats()
+    report_cache = providers.loaded("report_cache")
+    if report_cache:
+        metrics["report_cache"] = report_cache.stats()
+    image_store = providers.loaded("image_store")
+    if image_store:
+        metrics["image_store"] = image_store.stats()
+    resumable_uploads = providers.loaded("resumable_uploads")
+    if resumable_uploads:
+        metrics["resumable_uploads"] = resumable_uploads.stats()
+    derivatives = providers.loaded("derivatives")
+    if derivatives:
+        metrics["derivatives"] = derivatives.stats()
+    pdf_service = providers.loaded("pdf")
+    if pdf_service:
+        metrics["pdf"] = pdf_service.stats()
+    principals = providers.loaded("principals")
+    if principals:
+        metrics["principals"] = principals.stats()
+    password_hasher = providers.loaded("password_hasher")
+    if password_hasher:
+        metrics["password_hasher"] = password_hasher.stats()
+    explanation_service = providers.loaded("explanation")
+    if explanation_service:
+        metrics["explanation"] = explanation_service.stats()
+    return metrics
+
+
+@router.delete("/analysis-cache")
+def invalidate_analysis_cache(
+    stale_only: bool = True,
+    db: Session = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    analysis_cache = providers.get_analysis_cache()
+    deleted = analysis_cache.invalidate(db, stale_only=stale_only)
+    return {"deleted": deleted, "model": analysis_cache.model_name}
+
+
+@router.post("/image-store/gc")
+def collect_image_garbage(current_admin: Principal = Depends(get_current_admin)):
+    """Run the unreferenced-blob sweep now instead of waiting for the background one."""
+    return providers.get_image_store().collect_garbage()
@@ -1,75 +1,131 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import FileResponse
+from anyio import CancelScope, from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session
-from Backend.app.database import get_db
-from Backend.app.models.patient import Patient, PatientImage, ImageAnalysis, PatientReport
+from Backend.app.database import SessionLocal, get_db
+from Backend.app.models.patient import (
+    AnalysisJob, Patient, PatientImage, ImageAnalysis, PatientReport, UploadSession
+)
 from Backend.app.schemas.patients import (
     ImagesListResponse, LoginRequest, PatientCreate, PatientResponse, 
-    Token, UploadImageWithAnalysisResponse
+    Token, UploadImageWithAnalysisResponse, UploadSessionCreate
+)
+from Backend.app.utils.utils import create_access_token, password_needs_rehash
+from Backend.app.utils.http_cache import (
+    IMMUTABLE, REVALIDATE, cached_bytes_response, cached_file_response, is_not_modified, make_etag,
+    not_modified_response
 )
-from Backend.app.utils.utils import create_access_token, verify_password, verify_token
+from typing import List
+import asyncio
+import json
+import logging
+import mimetypes
 import os
-import shutil
+import time
 import uuid
-from datetime import datetime
-from Backend.app.services.vision_service import DentalVisionService
-from Backend.app.services.explanation_service import ExplanationService
-from Backend.app.services.pdf_service import PDFReportService
-
+import zipfile
+from Backend.app.services.admission_service import AdmissionRejected
+from Backend.app.services.analysis_cache_service import hash_image
+from Backend.app.services.disk_cache_service import write_atomic
+from Backend.app.services.password_service import HashingBusy
+from Backend.app.services.principal_service import Principal
+from Backend.app.services.upload_service import (
+    MAX_UPLOAD_BYTES, UploadRejected, aingest_staged, aingest_upload, check_image
+)
+from Backend.app.services.providers import (
+    get_admission_controller, get_analysis_cache, get_derivative_service, get_explanation_service, get_image_store,
+    get_password_hasher, get_pdf_service, get_principal_cache, get_report_cache, get_resumable_uploads,
+    get_vision_service
+)
 
-explanation_service = ExplanationService()
-vision_service = DentalVisionService()
-pdf_service = PDFReportService()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/patients/login/form", auto_error=False, scheme_name="PatientOAuth2")
 
 
+def _too_many_logins(e: HashingBusy) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("/register", response_model=PatientResponse)
-def register_patient(patient: PatientCreate, db: Session = Depends(get_db)):
-    db_patient = db.query(Patient).filter(
-        (Patient.email == patient.email) | (Patient.username == patient.username)
-    ).first()
+async def register_patient(patient: PatientCreate, db: Session = Depends(get_db)):
+    def exists():
+        try:
+            return db.query(Patient).filter(
+                (Patient.email == patient.email) | (Patient.username == patient.username)
+            ).first() is not None
+        finally:
+            # Don't hold a connection while the password is hashed
+            db.close()
 
-    if db_patient:
+    if await run_in_threadpool(exists):
         raise HTTPException(status_code=400, detail="Patient already exists")
 
     new_patient = Patient(email=patient.email, username=patient.username)
-    new_patient.set_password(patient.password)
+    # Hashed on the password pool, not in a request thread
+    try:
+        hasher = await run_in_threadpool(get_password_hasher)
+        new_patient.password = await hasher.hash(patient.password)
+    except HashingBusy as e:
+        raise _too_many_logins(e)
 
-    db.add(new_patient)
-    db.commit()
-    db.refresh(new_patient)
+    def save():
+        db.add(new_patient)
+        db.commit()
+        db.refresh(new_patient)
+        return new_patient
+    return await run_in_threadpool(save)
 
-    return new_patient
 
+async def _authenticate(db: Session, background_tasks: BackgroundTasks, username: str, password: str) -> Patient:
+    """Return the patient for a correct username and password, else raise 401."""
+    def lookup():
+        try:
+            return db.query(Patient).filter(Patient.username == username).first()
+        finally:
+            db.close()
+    patient = await run_in_threadpool(lookup)
 
-@router.post("/login", response_model=Token)
-def login(
-    login_data: LoginRequest,
-    db: Session = Depends(get_db)
-):
-    patient = db.query(Patient).filter(Patient.username == login_data.username).first()
+    # Built at startup; if not, its bcrypt calibration runs in a thread rather than on the loop
+    hasher = await run_in_threadpool(get_password_hasher)
+    try:
+        if patient is None:
+            await hasher.reject_unknown(password)
+            valid = False
+        else:
+            valid = await hasher.verify(password, patient.password)
+    except HashingBusy as e:
+        raise _too_many_logins(e)
 
-    if not patient:
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
         )
+    if password_needs_rehash(patient.password):
+        background_tasks.add_task(hasher.upgrade, Patient, patient.id, password)
+    return patient
 
-    if not verify_password(login_data.password, patient.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password"
-        )
 
+@router.post("/login", response_model=Token)
+async def login(
+    login_data: LoginRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    patient = await _authenticate(db, background_tasks, login_data.username, login_data.password)
     access_token = create_access_token(data={"sub": patient.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_current_patient(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = verify_token(token)
+def get_current_patient(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    # Token and account are both cached briefly, so most requests never query `patients`
+    principals = get_principal_cache()
+    payload = principals.decode(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,19 +133,27 @@ def get_current_patient(token: str = Depends(oauth2_scheme), db: Session = Depen
         )
 
     username = payload.get("sub")
-    patient = db.query(Patient).filter(Patient.username == username).first()
+    patient = principals.get("patient", username)
+    if patient is None:
+        row = db.query(Patient).filter(Patient.username == username).first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Patient not found"
+            )
+        patient = principals.put("patient", row)
 
-    if not patient:
+    if not patient.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Patient not found"
+            detail="Patient account is deactivated"
         )
 
     return patient
 
 
 @router.get("/me")
-def read_patients_me(current_patient: Patient = Depends(get_current_patient)):
+def read_patients_me(current_patient: Principal = Depends(get_current_patient)):
     return {
         "id": current_patient.id,
         "username": current_patient.username,
@@ -98,69 +162,33 @@ def read_patients_me(current_patient: Patient = Depends(get_current_patient)):
 
 
 @router.post("/login/form", response_model=Token)
-def login_form(
+async def login_form(
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    patient = db.query(Patient).filter(Patient.username == form_data.username).first()
-
-    if not patient or not verify_password(form_data.password, patient.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password"
-        )
-
+    patient = await _authenticate(db, background_tasks, form_data.username, form_data.password)
     access_token = create_access_token(data={"sub": patient.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.post("/upload-image", response_model=UploadImageWithAnalysisResponse)
-def upload_image(
-    file: UploadFile = File(...),
-    current_patient: Patient = Depends(get_current_patient),
-    db: Session = Depends(get_db)
-):
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Only JPEG and PNG images allowed")
-    
-    # Generate UUIDs
-    image_uuid = str(uuid.uuid4())
-    analysis_uuid = str(uuid.uuid4())
-    report_uuid = str(uuid.uuid4())
-    
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{image_uuid}{file_extension}"
-    
-    # Create patient directory
-    patient_dir = f"uploads/patient_{current_patient.id}"
-    os.makedirs(patient_dir, exist_ok=True)
-    
-    # Save image
-    file_path = f"{patient_dir}/{unique_filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Read image for analysis
-    with open(file_path, "rb") as f:
-        image_bytes = f.read()
-    
-    # Run AI analysis
-    try:
-        result = vision_service.analyze(image_bytes)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-    
-    top = result["top_prediction"]
-    
-    # Helper function for confidence level
-    def get_confidence_level(conf):
-        return "High" if conf > 0.8 else "Medium" if conf > 0.5 else "Low"
-    
-    # Prepare all findings
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "50"))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(200 * 1024 * 1024)))
+DEFER_BY_DEFAULT = os.getenv("UPLOAD_DEFER_DEFAULT", "false").lower() == "true"
+JOB_TERMINAL_STATES = ("done", "failed")
+JOB_POLL_INTERVAL = 0.5
+JOB_EVENTS_TIMEOUT = float(os.getenv("JOB_EVENTS_TIMEOUT", "120"))
+THUMBNAIL_WIDTH = 256
+
+
+def get_confidence_level(conf):
+    return "High" if conf > 0.8 else "Medium" if conf > 0.5 else "Low"
+
+
+def _build_findings(all_probabilities: dict) -> list:
     all_findings = []
-    for condition, prob in result["all_probabilities"].items():
+    for condition, prob in all_probabilities.items():
         all_findings.append({
             "condition": condition,
             "confidence": prob,
@@ -170,110 +198,785 @@ def upload_image(
     
     # Sort by confidence
     all_findings.sort(key=lambda x: x["confidence"], reverse=True)
+    return all_findings
+
+
+def _lookup_cached_analysis(db: Session, image_bytes: bytes, content_hash: str = None) -> tuple:
+    """Return (content_hash, cached_result_or_None)."""
+    start = time.time()
+    content_hash = content_hash or hash_image(image_bytes)
+    cached = get_analysis_cache().get(db, content_hash)
+    if cached:
+        cached = {**cached, "processing_time_ms": round((time.time() - start) * 1000, 2)}
+    return content_hash, cached
+
+
+async def _aexplain(result: dict) -> dict:
+    top = result["top_prediction"]
+    # The first call builds the service; keep that (and its lock) off the event loop
+    explanation_service = await run_in_threadpool(get_explanation_service)
+    return await explanation_service.agenerate_explanation(
+        top["class"],
+        top["confidence"],
+        result["all_probabilities"]
+    )
+
+
+def _explain(result: dict) -> dict:
+    # Stays in the calling worker thread: handing it to the loop would have it wait on
+    # run_in_threadpool for a slot while already holding one
+    top = result["top_prediction"]
+    return get_explanation_service().generate_explanation(
+        top["class"],
+        top["confidence"],
+        result["all_probabilities"]
+    )
+
+
+def _report_key(analysis_uuid: str) -> str:
+    return f"report_{analysis_uuid}"
+
+
+def _create_report(db: Session, patient_id: int, db_analysis: ImageAnalysis, explanation: dict) -> PatientReport:
+    """Add the PatientReport row for an analysis (not committed).
+
+    The PDF itself is rendered on first download (see _render_report).
+    """
+    db_report = PatientReport(
+        uuid=str(uuid.uuid4()),
+        patient_id=patient_id,
+        analysis_id=db_analysis.id,
+        pdf_path=get_report_cache().path_for(_report_key(db_analysis.uuid)),
+        prediction=db_analysis.prediction,
+        confidence=db_analysis.confidence,
+        risk_level=get_confidence_level(db_analysis.confidence),
+        recommendations=explanation.get("recommendations", []),
+        explanation=explanation
+    )
+    db.add(db_report)
+    return db_report
+
+
+def _render_report(analysis: ImageAnalysis, report: PatientReport, patient_name: str) -> tuple:
+    """Return (path, pdf_bytes_or_None) for the analysis PDF, rendering it from the stored data if it isn't cached."""
+    explanation = analysis.explanation or report.explanation
     
-    # Generate explanation
-    explanation = explanation_service.generate_explanation(
-        prediction=top["class"],
-        confidence=top["confidence"],
-        all_probabilities=result["all_probabilities"]
+    # Prepare data for PDF
+    pdf_data = {
+        "primary_finding": {
+            "condition": analysis.prediction,
+            "confidence_percentage": round(analysis.confidence * 100, 1),
+            "level": get_confidence_level(analysis.confidence)
+        },
+        "all_findings": _build_findings(analysis.all_probabilities),
+        "explanation": explanation
+    }
+    
+    return get_report_cache().get_or_render(
+        _report_key(analysis.uuid),
+        lambda: get_pdf_service().render_report(
+            patient_name=patient_name,
+            analysis_data=pdf_data,
+            generated_at=analysis.analyzed_at
+        )
+    )
+
+
+def report_pdf(analysis: ImageAnalysis, report: PatientReport, patient_name: str) -> tuple:
+    """Return (path, pdf_bytes_or_None) for a report, rendering it if needed."""
+    # Reports are rendered on first download and kept in a bounded disk cache;
+    # only rows from before that still point at a PDF rendered during upload
+    cached_path = get_report_cache().path_for(_report_key(analysis.uuid))
+    if report.pdf_path == cached_path or not os.path.exists(report.pdf_path):
+        return _render_report(analysis, report, patient_name)
+    return report.pdf_path, None
+
+
+def _report_etag(analysis: ImageAnalysis, report: PatientReport, patient_name: str) -> str:
+    cached_path = get_report_cache().path_for(_report_key(analysis.uuid))
+    if report.pdf_path != cached_path:
+        # Rendered during upload (before the report cache) and never rewritten
+        return make_etag(report.pdf_path)
+    # Rendering is deterministic (invariant PDFs, fixed timestamp), so its inputs identify the bytes
+    explanation = analysis.explanation or report.explanation
+    return make_etag(analysis.uuid, patient_name, json.dumps(explanation, sort_keys=True))
+
+
+def _job_links(job_uuid: str) -> dict:
+    return {
+        "id": job_uuid,
+        "status_url": f"/patients/jobs/{job_uuid}",
+        "events_url": f"/patients/jobs/{job_uuid}/events"
+    }
+
+
+def _add_image(db: Session, patient_id: int, image: dict) -> PatientImage:
+    # Reference the content in the image store (storing it if it's new) in the same transaction as the row
+    file_path = get_image_store().add(
+        db,
+        image["content_hash"],
+        image["extension"],
+        image["size"],
+        image["mime_type"],
+        tmp_path=image.get("tmp_path"),
+        data=image.get("data")
     )
     
     # Create image record in database
     db_image = PatientImage(
-        uuid=image_uuid,
-        patient_id=current_patient.id,
-        filename=unique_filename,
-        original_name=file.filename,
+        uuid=image["uuid"],
+        patient_id=patient_id,
+        filename=image["filename"],
+        original_name=image["original_name"],
         file_path=file_path,
-        file_size=file.size,
-        mime_type=file.content_type
+        file_size=image["size"],
+        mime_type=image["mime_type"]
     )
     db.add(db_image)
     db.flush()  # Get the ID without committing
     
+    # Thumbnails for the history view, rendered off the request path
+    get_derivative_service().pregenerate(file_path)
+    return db_image
+
+
+def _add_analysis(db: Session, db_image: PatientImage, result: dict) -> ImageAnalysis:
+    """Add the analysis row; the explanation is filled in by _finish_analysis."""
+    top = result["top_prediction"]
+    
     # Create analysis record in database
     db_analysis = ImageAnalysis(
-        uuid=analysis_uuid,
+        uuid=str(uuid.uuid4()),
         image_id=db_image.id,
         prediction=top["class"],
         confidence=top["confidence"],
         all_probabilities=result["all_probabilities"],
         processing_time_ms=result["processing_time_ms"],
-        explanation=explanation
+        explanation={}
     )
     db.add(db_analysis)
     db.flush()
+    return db_analysis
+
+
+def _finish_analysis(db: Session, patient_id: int, image: dict, db_image: PatientImage,
+                     db_analysis: ImageAnalysis, result: dict, cached: bool, explanation: dict,
+                     defer: bool = False) -> dict:
+    """Attach the explanation plus the report (or job) row, commit and build the response payload."""
+    top = result["top_prediction"]
+    db_analysis.explanation = explanation
     
-    # Generate PDF report
-    pdf_filename = f"reports/report_{analysis_uuid}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    os.makedirs("reports", exist_ok=True)
+    job_uuid = None
+    if defer:
+        job_uuid = str(uuid.uuid4())
+        db.add(AnalysisJob(uuid=job_uuid, analysis_id=db_analysis.id, status="pending"))
+    else:
+        _create_report(db, patient_id, db_analysis, explanation)
     
-    # Prepare data for PDF
-    pdf_data = {
-        "primary_finding": {
-            "condition": top["class"],
-            "confidence_percentage": round(top["confidence"] * 100, 1),
-            "level": get_confidence_level(top["confidence"])
+    # Commit all changes
+    db.commit()
+    
+    payload = {
+        "image": {
+            "id": image["uuid"],
+            "filename": image["original_name"],
+            "uploaded_at": db_image.uploaded_at.isoformat(),
+            "size": image["size"]
         },
-        "all_findings": all_findings,
-        "explanation": explanation
+        "analysis": {
+            "id": db_analysis.uuid,
+            "primary_finding": {
+                "condition": top["class"],
+                "confidence": top["confidence"],
+                "confidence_percentage": round(top["confidence"] * 100, 2),
+                "level": get_confidence_level(top["confidence"])
+            },
+            "all_findings": _build_findings(result["all_probabilities"]),
+            "explanation": explanation or None,
+            "analysis_time_ms": result["processing_time_ms"],
+            "cached": cached,
+            "pdf_url": f"/patients/download-report/{db_analysis.uuid}"
+        }
     }
+    if job_uuid:
+        payload["job"] = _job_links(job_uuid)
+    return payload
+
+
+def _record_analysis(db: Session, patient_id: int, image: dict, result: dict, cached: bool,
+                     defer: bool = False) -> dict:
+    """Persist one analyzed image; returns the response payload.
+
+    With `defer`, the explanation is left to a background job (see
+    _run_analysis_job) and the payload carries the job's links.
+    """
+    # Generate explanation
+    explanation = {} if defer else _explain(result)
     
-    # Generate PDF
-    pdf_path = pdf_service.generate_report(
-        patient_name=current_patient.username,
-        analysis_data=pdf_data,
-        filename=pdf_filename
-    )
+    db_image = _add_image(db, patient_id, image)
+    db_analysis = _add_analysis(db, db_image, result)
+    return _finish_analysis(db, patient_id, image, db_image, db_analysis, result, cached, explanation, defer)
+
+
+def _run_analysis_job(job_uuid: str, patient_id: int):
+    """Background task: generate the explanation and add the report, tracking progress on the job row."""
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.uuid == job_uuid).first()
+        if job is None:
+            return
+        analysis = job.analysis
+        
+        job.status = "running"
+        job.stage = "explanation"
+        db.commit()
+        
+        explanation = _explain({
+            "top_prediction": {"class": analysis.prediction, "confidence": analysis.confidence},
+            "all_probabilities": analysis.all_probabilities
+        })
+        analysis.explanation = explanation
+        _create_report(db, patient_id, analysis, explanation)
+        job.status = "done"
+        job.stage = None
+        db.commit()
+    except Exception as e:
+        logger.error(f"Analysis job {job_uuid} failed: {e}")
+        db.rollback()
+        job = db.query(AnalysisJob).filter(AnalysisJob.uuid == job_uuid).first()
+        if job is not None:
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+async def _discard_upload(db: Session, insert_image: asyncio.Future, tmp_path: str):
+    """Undo a failed async upload: drop its image row and store reference (if inserted) or the staged file."""
+    def discard(db_image):
+        db.rollback()
+        if isinstance(db_image, PatientImage):
+            get_image_store().release(db, [db_image.file_path])
+            db.delete(db_image)
+            db.commit()
+        get_image_store().discard_staged(tmp_path)
     
-    # Create report record in database
-    db_report = PatientReport(
-        uuid=report_uuid,
-        patient_id=current_patient.id,
-        analysis_id=db_analysis.id,
-        pdf_path=pdf_path,
-        prediction=top["class"],
-        confidence=top["confidence"],
-        risk_level=get_confidence_level(top["confidence"]),
-        recommendations=explanation.get("recommendations", []),
-        explanation=explanation
-    )
-    db.add(db_report)
+    # Also runs when the client went away and the request was cancelled; without the
+    # shield the cancellation would land on the first await here as well
+    with CancelScope(shield=True):
+        results = await asyncio.gather(insert_image, return_exceptions=True)
+        await run_in_threadpool(discard, results[0])
+
+
+def _busy(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def _aanalyze_admitted(vision_service, patient_id: int, images: list) -> list:
+    """Analyze `images` on one admission slot each; returns, per image, its result or the
+    AdmissionRejected that turned it away.
+
+    Slots are taken one at a time, so the patient's batch takes its turns round-robin
+    with everyone else's uploads. Images already admitted run together and still share
+    model batches.
+    """
+    admission = get_admission_controller()
     
-    # Commit all changes
-    db.commit()
+    async def analyze(ticket, image_bytes):
+        try:
+            return await vision_service.aanalyze(image_bytes)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            admission.release(ticket)
+    
+    tasks = []
+    rejected = None
+    for image_bytes in images:
+        try:
+            ticket = await admission.acquire(patient_id)
+        except AdmissionRejected as e:
+            rejected = e
+            break
+        tasks.append(asyncio.ensure_future(analyze(ticket, image_bytes)))
+    results = list(await asyncio.gather(*tasks))
+    return results + [rejected] * (len(images) - len(results))
+
+
+@router.post("/upload-image", response_model=UploadImageWithAnalysisResponse)
+async def upload_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    defer: bool = DEFER_BY_DEFAULT,
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    """Async upload pipeline.
+
+    File I/O runs on the upload executor and inference on the vision
+    service's own executor, so slow uploads don't occupy the request
+    threadpool that logins and downloads share. The image row is inserted
+    while the model runs, and the analysis-cache write happens while the
+    explanation is generated. Each database step is a short transaction
+    run in the threadpool, and no connection is held across an await.
+    Otherwise a burst of uploads would hold the whole pool while waiting
+    on the model or the LLM.
+    """
+    patient_id = current_patient.id
+    # Hand back the connection authentication used before the file streams in. Done
+    # inline: if every threadpool thread is waiting for a connection, a threadpool
+    # call here could never run to release this one
+    db.close()
+    
+    # FastAPI has already received the multipart body by now; when the model is saturated,
+    # refuse before it is copied to staging, hashed and stored
+    try:
+        get_admission_controller().check(patient_id)
+    except AdmissionRejected as e:
+        raise _busy(e)
+    
+    # One pass over the upload: type sniffed from its bytes, size-checked, hashed and stored
+    try:
+        upload = await aingest_upload(file.file, get_image_store().staging_dir)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    try:
+        return await _analyze_upload(db, background_tasks, patient_id, upload, file.filename, defer)
+    except AdmissionRejected as e:
+        await run_in_threadpool(get_image_store().discard_staged, upload["tmp_path"])
+        raise _busy(e)
+
+
+async def _analyze_upload(db: Session, background_tasks: BackgroundTasks, patient_id: int, upload: dict,
+                          original_name: str, defer: bool) -> dict:
+    """Analyze and store an ingested upload (see upload_image); returns the response body.
+
+    Raises AdmissionRejected, before anything is stored, when no inference
+    slot frees up in time; the staged file is then left to the caller.
+    """
+    image_bytes = upload["data"]
+    
+    # Reuse the stored result when this exact image was analyzed before
+    def lookup():
+        try:
+            return _lookup_cached_analysis(db, image_bytes, upload["content_hash"])
+        finally:
+            db.close()
+    content_hash, cached = await run_in_threadpool(lookup)
+    
+    # Only a model run needs a slot; cached results are served however busy the model is
+    admission = None if cached else get_admission_controller()
+    ticket = await admission.acquire(patient_id) if admission else None
+    
+    image = {
+        "uuid": upload["uuid"],
+        "filename": upload["filename"],
+        "original_name": original_name,
+        "tmp_path": upload["tmp_path"],
+        "content_hash": content_hash,
+        "extension": upload["extension"],
+        "size": upload["size"],
+        "mime_type": upload["mime_type"]
+    }
+    
+    def add_image():
+        db_image = _add_image(db, patient_id, image)
+        db.commit()
+        return db_image
+    # The image row doesn't depend on the result, so insert it while the model runs
+    insert_image = asyncio.ensure_future(run_in_threadpool(add_image))
+    
+    try:
+        # Run AI analysis
+        if cached:
+            result = cached
+        else:
+            # Resolved in a thread: if warm-up hasn't finished (or failed), this is where the model loads
+            vision_service = await run_in_threadpool(get_vision_service)
+            result = await vision_service.aanalyze(image_bytes)
+    except Exception as e:
+        await _discard_upload(db, insert_image, upload["tmp_path"])
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    except BaseException:
+        # Cancelled (client disconnected): the image row may already be committed
+        await _discard_upload(db, insert_image, upload["tmp_path"])
+        raise
+    finally:
+        if admission:
+            admission.release(ticket)
+    try:
+        db_image = await insert_image
+    except BaseException:
+        await _discard_upload(db, insert_image, upload["tmp_path"])
+        raise
+    
+    # Start the explanation as soon as the probabilities are in
+    explain = None if defer else asyncio.ensure_future(_aexplain(result))
+    
+    def finish(explanation):
+        try:
+            db_analysis = _add_analysis(db, db_image, result)
+            return _finish_analysis(
+                db, patient_id, image, db_image, db_analysis, result, cached is not None, explanation, defer
+            )
+        except Exception:
+            db.rollback()
+            raise
+    
+    try:
+        if not cached:
+            def store_result():
+                get_analysis_cache().put(db, content_hash, result)
+                db.commit()
+            await run_in_threadpool(store_result)
+        explanation = await explain if explain else {}
+        data = await run_in_threadpool(finish, explanation)
+    except BaseException:
+        if explain:
+            explain.cancel()
+        await _discard_upload(db, insert_image, upload["tmp_path"])
+        raise
+    
+    if defer:
+        background_tasks.add_task(_run_analysis_job, data["job"]["id"], patient_id)
+        message = "Image uploaded and analyzed; explanation and report are being generated"
+    else:
+        message = "Image uploaded and analyzed successfully"
     
     # Return response with PDF URL
     return {
         "success": True,
-        "message": "Image uploaded and analyzed successfully",
-        "data": {
-            "image": {
-                "id": image_uuid,
-                "filename": file.filename,
-                "uploaded_at": db_image.uploaded_at.isoformat(),
-                "size": file.size
-            },
-            "analysis": {
-                "id": analysis_uuid,
-                "primary_finding": {
-                    "condition": top["class"],
-                    "confidence": top["confidence"],
-                    "confidence_percentage": round(top["confidence"] * 100, 2),
-                    "level": get_confidence_level(top["confidence"])
-                },
-                "all_findings": all_findings,
-                "explanation": explanation,
-                "analysis_time_ms": result["processing_time_ms"],
-                "pdf_url": f"/patients/download-report/{analysis_uuid}"
-            }
-        }
+        "message": message,
+        "data": data
     }
 
 
+def _upload_snapshot(session: UploadSession) -> dict:
+    return {
+        "id": session.uuid,
+        "filename": session.original_name,
+        "size": session.size,
+        "offset": session.received,
+        "status": session.status,
+        "chunk_url": f"/patients/uploads/{session.uuid}",
+        "finalize_url": f"/patients/uploads/{session.uuid}/finalize"
+    }
+
+
+@router.post("/uploads", status_code=status.HTTP_201_CREATED)
+def create_upload(
+    upload: UploadSessionCreate,
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable upload.
+
+    The client PUTs the file's bytes to `chunk_url?offset=N` in as many
+    pieces as it likes. After a dropped connection it GETs the upload to
+    learn how much arrived and resends from that offset. POSTing to
+    `finalize_url` then analyzes the image exactly as /upload-image does.
+    """
+    try:
+        session = get_resumable_uploads().create(db, current_patient.id, upload.filename, upload.size)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    db.commit()
+    return _upload_snapshot(session)
+
+
+@router.get("/uploads/{upload_uuid}")
+def get_upload(
+    upload_uuid: str,
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    try:
+        session = get_resumable_uploads().get(db, current_patient.id, upload_uuid)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _upload_snapshot(session)
+
+
+@router.put("/uploads/{upload_uuid}")
+async def upload_chunk(
+    upload_uuid: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    """Write the raw request body into the upload at `offset`.
+
+    The body is streamed straight into the assembled file. However much of
+    it reaches the disk is recorded, even when the connection drops
+    partway.
+    """
+    patient_id = current_patient.id
+    uploads = get_resumable_uploads()
+    
+    def load():
+        try:
+            session = uploads.get(db, patient_id, upload_uuid)
+            uploads.check_chunk(session, offset)
+            return session.size
+        finally:
+            db.close()
+    try:
+        size = await run_in_threadpool(load)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    written = 0
+    
+    def record():
+        try:
+            if written:
+                uploads.record(db, upload_uuid, offset + written)
+                db.commit()
+            return _upload_snapshot(uploads.get(db, patient_id, upload_uuid))
+        finally:
+            db.close()
+    
+    error = None
+    try:
+        async for count in uploads.write(upload_uuid, offset, request.stream(), size - offset):
+            written += count
+    except UploadRejected as e:
+        error = HTTPException(status_code=e.status_code, detail=e.detail)
+    except ClientDisconnect:
+        error = HTTPException(status_code=400, detail="Upload interrupted")
+    
+    snapshot = await run_in_threadpool(record)
+    if error:
+        raise error
+    return snapshot
+
+
+@router.post("/uploads/{upload_uuid}/finalize", response_model=UploadImageWithAnalysisResponse)
+async def finalize_upload(
+    upload_uuid: str,
+    background_tasks: BackgroundTasks,
+    defer: bool = DEFER_BY_DEFAULT,
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    """Analyze a completely received upload; the response is the same as /upload-image's."""
+    patient_id = current_patient.id
+    uploads = get_resumable_uploads()
+    
+    try:
+        get_admission_controller().check(patient_id)
+    except AdmissionRejected as e:
+        raise _busy(e)
+    
+    def claim():
+        try:
+            session = uploads.claim(db, patient_id, upload_uuid)
+            db.commit()
+            return session.original_name
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    try:
+        original_name = await run_in_threadpool(claim)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    # The assembled file becomes the staged upload, so the image store moves it into place
+    path = uploads.path_for(upload_uuid)
+    try:
+        upload = await aingest_staged(path)
+    except UploadRejected as e:
+        get_image_store().discard_staged(path)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    try:
+        return await _analyze_upload(db, background_tasks, patient_id, upload, original_name, defer)
+    except AdmissionRejected as e:
+        # Nothing was stored: keep the received file so finalizing can simply be retried
+        def reopen():
+            try:
+                uploads.reopen(db, upload_uuid)
+                db.commit()
+            finally:
+                db.close()
+        await run_in_threadpool(reopen)
+        raise _busy(e)
+
+
+def _is_zip(file: UploadFile) -> bool:
+    return file.content_type in ("application/zip", "application/x-zip-compressed") or \
+        (file.filename or "").lower().endswith(".zip")
+
+
+def _checked_image(name: str, data: bytes) -> tuple:
+    try:
+        mime_type, extension = check_image(data)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{name}: {e.detail}")
+    return name, data, mime_type, extension
+
+
+def _collect_batch_images(files: List[UploadFile]) -> list:
+    """Flatten uploaded images and zip archives into (name, bytes, mime type, extension) tuples."""
+    images = []
+    total_bytes = 0
+    
+    def add(name: str, size: int, read):
+        nonlocal total_bytes
+        # Checked before reading, so an archive of thousands of entries (or one huge one) is refused early
+        if len(images) >= MAX_BATCH_IMAGES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per batch")
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"{name}: image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        total_bytes += size
+        if total_bytes > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_BYTES // (1024 * 1024)} MB")
+        images.append(_checked_image(name, read()))
+    
+    for file in files:
+        if _is_zip(file):
+            try:
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid zip archive")
+            with archive:
+                for member in archive.infolist():
+                    name = os.path.basename(member.filename)
+                    if member.is_dir() or name.startswith(".") or mimetypes.guess_type(name)[0] not in ALLOWED_IMAGE_TYPES:
+                        continue
+                    # The declared size; zipfile won't inflate past it
+                    add(name, member.file_size, lambda: archive.read(member))
+        else:
+            # One byte over the limit is enough to reject it
+            data = file.file.read(MAX_UPLOAD_BYTES + 1)
+            add(file.filename, len(data), lambda: data)
+    
+    if not images:
+        raise HTTPException(status_code=400, detail="No images found in upload")
+    return images
+
+
+@router.post("/upload-images")
+def upload_images(
+    files: List[UploadFile] = File(...),
+    series_report: bool = False,
+    current_patient: Principal = Depends(get_current_patient)
+):
+    """Analyze a series of images (files and/or zips) and stream one NDJSON line per image."""
+    images = _collect_batch_images(files)
+    patient_id = current_patient.id
+    patient_name = current_patient.username
+    
+    def _record_batch_item(db, index, image, result, cached, series_items):
+        try:
+            data = _record_analysis(db, patient_id, image, result, cached)
+        except Exception as e:
+            db.rollback()
+            return json.dumps({"index": index, "filename": image["original_name"], "success": False,
+                               "error": str(e)}) + "\n"
+        analysis = data["analysis"]
+        series_items.append({
+            "image_name": image["original_name"],
+            "primary_finding": analysis["primary_finding"],
+            "all_findings": analysis["all_findings"],
+            "explanation": analysis["explanation"]
+        })
+        return json.dumps({"index": index, "success": True, "data": data}) + "\n"
+    
+    def stream():
+        # The request-scoped session is closed before streaming starts
+        db = SessionLocal()
+        series_items = []
+        try:
+            pending = []
+            for index, (name, image_bytes, mime_type, extension) in enumerate(images):
+                content_hash, cached = _lookup_cached_analysis(db, image_bytes)
+                image_uuid = str(uuid.uuid4())
+                # Stored when the image row is added (see _add_image)
+                image = {
+                    "uuid": image_uuid,
+                    "filename": f"{image_uuid}{extension}",
+                    "original_name": name,
+                    "data": image_bytes,
+                    "content_hash": content_hash,
+                    "extension": extension,
+                    "size": len(image_bytes),
+                    "mime_type": mime_type
+                }
+                if cached:
+                    yield _record_batch_item(db, index, image, cached, True, series_items)
+                else:
+                    pending.append((index, image, content_hash, image_bytes))
+            
+            # Everything left is admitted image by image, like single uploads
+            results = []
+            if pending:
+                vision_service = get_vision_service()
+                results = from_thread.run(_aanalyze_admitted, vision_service, patient_id,
+                                          [item[3] for item in pending])
+            for (index, image, content_hash, _), result in zip(pending, results):
+                if isinstance(result, AdmissionRejected):
+                    yield json.dumps({"index": index, "filename": image["original_name"], "success": False,
+                                      "error": str(result), "retry_after": result.retry_after}) + "\n"
+                    continue
+                if not result["success"]:
+                    yield json.dumps({"index": index, "filename": image["original_name"], "success": False,
+                                      "error": f"Analysis failed: {result['error']}"}) + "\n"
+                    continue
+                get_analysis_cache().put(db, content_hash, result)
+                yield _record_batch_item(db, index, image, result, False, series_items)
+            
+            if series_report and series_items:
+                series_uuid = str(uuid.uuid4())
+                pdf_bytes = get_pdf_service().render_series_report(patient_name=patient_name, items=series_items)
+                write_atomic(_series_report_path(patient_id, series_uuid), pdf_bytes)
+                yield json.dumps({
+                    "series_report": True,
+                    "pdf_url": f"/patients/download-series-report/{series_uuid}"
+                }) + "\n"
+        finally:
+            db.close()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _series_report_path(patient_id: int, series_uuid: str) -> str:
+    return f"reports/patient_{patient_id}/series_{series_uuid}.pdf"
+
+
+@router.get("/download-series-report/{series_uuid}")
+def download_series_report(
+    series_uuid: str,
+    request: Request,
+    current_patient: Principal = Depends(get_current_patient)
+):
+    try:
+        uuid.UUID(series_uuid)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    # Series reports live under the patient's own directory, so the path is the ownership check
+    pdf_path = _series_report_path(current_patient.id, series_uuid)
+    etag = make_etag(pdf_path)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, IMMUTABLE)
+    if not os.path.exists(pdf_path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    
+    return cached_file_response(
+        pdf_path, 'application/pdf', etag, IMMUTABLE,
+        filename=f"teledent_series_report_{series_uuid}.pdf"
+    )
+
+
 @router.get("/get-all-images")
 def get_my_images(
-    current_patient: Patient = Depends(get_current_patient),
+    current_patient: Principal = Depends(get_current_patient),
     db: Session = Depends(get_db)
 ):
     images = db.query(PatientImage).filter(
@@ -287,7 +990,8 @@ def get_my_images(
             "original_name": img.original_name,
             "uploaded_at": img.uploaded_at.isoformat(),
             "size": img.file_size,
-            "url": f"/patients/images/{img.uuid}"
+            "url": f"/patients/images/{img.uuid}",
+            "thumbnail_url": f"/patients/images/{img.uuid}?width={THUMBNAIL_WIDTH}&format=webp"
         })
     
     return {"images": result}
@@ -296,7 +1000,10 @@ def get_my_images(
 @router.get("/images/{image_uuid}")
 def get_image_by_id(
     image_uuid: str,
-    current_patient: Patient = Depends(get_current_patient),
+    request: Request,
+    width: int = Query(None, ge=1, description="Scale down to this width (snapped up to a standard size)"),
+    format: str = Query(None, pattern="^(webp|jpeg)$", description="Transcode to this format"),
+    current_patient: Principal = Depends(get_current_patient),
     db: Session = Depends(get_db)
 ):
     image = db.query(PatientImage).filter(
@@ -307,50 +1014,225 @@ def get_image_by_id(
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
+    # Stored files never change under their path (content hash or upload UUID), so the
+    # validator comes from the row alone and a revalidation never touches the disk
+    derivatives = get_derivative_service()
+    if width or format:
+        # Without a format, JPEGs stay JPEG and PNGs become WebP
+        fmt = format or ("jpeg" if image.mime_type == "image/jpeg" else "webp")
+        etag = make_etag(derivatives.key_for(image.file_path, derivatives.snap_width(width), fmt))
+    else:
+        etag = make_etag(image.file_path)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, IMMUTABLE)
+    
     if not os.path.exists(image.file_path):
         raise HTTPException(status_code=404, detail="Image file not found")
     
-    return FileResponse(
-        path=image.file_path,
-        media_type=image.mime_type,
-        filename=image.original_name
-    )
+    if width or format:
+        # Resized/transcoded variant from the derivative cache
+        path, data, media_type = derivatives.get(image.file_path, width, fmt)
+        if data is not None:
+            return cached_bytes_response(data, media_type, etag, IMMUTABLE)
+        return cached_file_response(path, media_type, etag, IMMUTABLE)
+    
+    return cached_file_response(image.file_path, image.mime_type, etag, IMMUTABLE, filename=image.original_name)
 
 
 @router.get("/download-report/{analysis_uuid}")
 def download_report(
     analysis_uuid: str,
-    current_patient: Patient = Depends(get_current_patient),
+    request: Request,
+    current_patient: Principal = Depends(get_current_patient),
     db: Session = Depends(get_db)
 ):
-    # Find analysis by UUID
-    analysis = db.query(ImageAnalysis).filter(
+    # Find analysis by UUID, with the patient's report for it in the same query
+    row = db.query(ImageAnalysis, PatientReport).outerjoin(
+        PatientReport,
+        (PatientReport.analysis_id == ImageAnalysis.id) & (PatientReport.patient_id == current_patient.id)
+    ).filter(
         ImageAnalysis.uuid == analysis_uuid
     ).first()
     
-    if not analysis:
+    if not row:
         raise HTTPException(status_code=404, detail="Analysis not found")
+    analysis, report = row
     
-    # Find report linked to this analysis
-    report = db.query(PatientReport).filter(
-        PatientReport.analysis_id == analysis.id,
-        PatientReport.patient_id == current_patient.id
-    ).first()
+    if not report and analysis.job and analysis.image.patient_id == current_patient.id:
+        # Deferred upload: the report shows up once the background job is done
+        if analysis.job.status not in JOB_TERMINAL_STATES:
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=_job_snapshot(analysis.job))
+        if analysis.job.status == "failed":
+            raise HTTPException(status_code=500, detail=f"Report generation failed: {analysis.job.error}")
     
-    if not report or not os.path.exists(report.pdf_path):
+    if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    return FileResponse(
-        path=report.pdf_path,
-        media_type='application/pdf',
-        filename=f"teledent_report_{analysis_uuid}.pdf"
+    # A saved explanation re-renders the PDF, so reports are revalidated rather than immutable;
+    # a match is answered before anything is rendered or read
+    etag = _report_etag(analysis, report, current_patient.username)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, REVALIDATE)
+    
+    filename = f"teledent_report_{analysis_uuid}.pdf"
+    pdf_path, pdf_bytes = report_pdf(analysis, report, current_patient.username)
+    if pdf_bytes is not None:
+        # Just rendered: answer from memory instead of re-reading the cache file
+        return cached_bytes_response(pdf_bytes, 'application/pdf', etag, REVALIDATE, filename=filename)
+    
+    return cached_file_response(pdf_path, 'application/pdf', etag, REVALIDATE, filename=filename)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _job_snapshot(job: AnalysisJob) -> dict:
+    snapshot = {
+        **_job_links(job.uuid),
+        "analysis_id": job.analysis.uuid,
+        "status": job.status,
+        "stage": job.stage,
+        "error": job.error,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None
+    }
+    if job.status == "done":
+        snapshot["pdf_url"] = f"/patients/download-report/{job.analysis.uuid}"
+    return snapshot
+
+
+def _load_job_snapshot(job_uuid: str, patient_id: int):
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).join(ImageAnalysis).join(PatientImage).filter(
+            AnalysisJob.uuid == job_uuid,
+            PatientImage.patient_id == patient_id
+        ).first()
+        return _job_snapshot(job) if job else None
+    finally:
+        db.close()
+
+
+@router.get("/jobs/{job_uuid}")
+async def get_job_status(
+    job_uuid: str,
+    wait: float = 0,
+    current_patient: Principal = Depends(get_current_patient)
+):
+    """Job status; with `wait` (seconds, max 30) long-polls until the job finishes."""
+    patient_id = current_patient.id
+    snapshot = await run_in_threadpool(_load_job_snapshot, job_uuid, patient_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    deadline = time.monotonic() + min(max(wait, 0), 30)
+    while snapshot["status"] not in JOB_TERMINAL_STATES and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        snapshot = await run_in_threadpool(_load_job_snapshot, job_uuid, patient_id)
+    
+    return snapshot
+
+
+@router.get("/jobs/{job_uuid}/events")
+async def stream_job_events(
+    job_uuid: str,
+    current_patient: Principal = Depends(get_current_patient)
+):
+    """Server-Sent Events: one `status` event per job state change until the job finishes."""
+    patient_id = current_patient.id
+    snapshot = await run_in_threadpool(_load_job_snapshot, job_uuid, patient_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events(snapshot):
+        deadline = time.monotonic() + JOB_EVENTS_TIMEOUT
+        last = None
+        while True:
+            if snapshot != last:
+                yield _sse("status", snapshot)
+                last = snapshot
+            if snapshot["status"] in JOB_TERMINAL_STATES:
+                break
+            if time.monotonic() >= deadline:
+                yield _sse("timeout", {})
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            snapshot = await run_in_threadpool(_load_job_snapshot, job_uuid, patient_id)
+    
+    return StreamingResponse(
+        events(snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _save_explanation(analysis_id: int, explanation: dict):
+    db = SessionLocal()
+    try:
+        analysis = db.query(ImageAnalysis).filter(ImageAnalysis.id == analysis_id).first()
+        if analysis is None:
+            return
+        analysis.explanation = explanation
+        if analysis.report is not None:
+            analysis.report.explanation = explanation
+            analysis.report.recommendations = explanation.get("recommendations", [])
+        db.commit()
+        # A cached PDF would still show the old explanation
+        get_report_cache().discard(_report_key(analysis.uuid))
+    finally:
+        db.close()
+
+
+@router.get("/analysis/{analysis_uuid}/explanation/stream")
+def stream_explanation(
+    analysis_uuid: str,
+    current_patient: Principal = Depends(get_current_patient),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events: `token` events as the LLM writes, then one `done` event with the
+    full explanation, which is also saved on the analysis."""
+    analysis = db.query(ImageAnalysis).join(PatientImage).filter(
+        ImageAnalysis.uuid == analysis_uuid,
+        PatientImage.patient_id == current_patient.id
+    ).first()
+    
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    analysis_id = analysis.id
+    existing = analysis.explanation
+    prediction = analysis.prediction
+    confidence = analysis.confidence
+    all_probabilities = analysis.all_probabilities
+    # Built here, in the request thread, rather than inside the async generator on the event loop
+    explanation_service = None if existing else get_explanation_service()
+    
+    async def events():
+        # Already explained: replay it instead of paying for another LLM call
+        if existing:
+            yield _sse("token", {"text": existing.get("explanation", "")})
+            yield _sse("done", existing)
+            return
+        
+        stream = explanation_service.astream_explanation(prediction, confidence, all_probabilities)
+        async for kind, payload in stream:
+            if kind == "token":
+                yield _sse("token", {"text": payload})
+            else:
+                await run_in_threadpool(_save_explanation, analysis_id, payload)
+                yield _sse("done", payload)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
 @router.get("/analysis/{analysis_uuid}")
 def get_analysis_details(
     analysis_uuid: str,
-    current_patient: Patient = Depends(get_current_patient),
+    current_patient: Principal = Depends(get_current_patient),
     db: Session = Depends(get_db)
 ):
     analysis = db.query(ImageAnalysis).filter(
@@ -375,6 +1257,7 @@ def get_analysis_details(
         "confidence": analysis.confidence,
         "all_probabilities": analysis.all_probabilities,
         "analyzed_at": analysis.analyzed_at.isoformat(),
-        "explanation": analysis.explanation
+        "explanation": analysis.explanation or None,
+        "job": _job_snapshot(analysis.job) if analysis.job else None
     }
 
@@ -66,6 +66,10 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+
 class UploadImageResponse(BaseModel):
     message: str
     image_id: str
@@ -0,0 +1,84 @@
+"""Micro-benchmark for PDF report rendering.
+
+Renders the same sample report repeatedly into memory and prints
+reports/sec for two setups: building a fresh ReportTemplate for every
+report (what generate_report used to do on each call) and reusing the
+service's shared template. With --workers, also renders the same number
+of reports concurrently through the process pool (render_report).
+
+Usage:
+    python -m Backend.app.scripts.bench_pdf --reports 200
+    python -m Backend.app.scripts.bench_pdf --reports 200 --workers 4
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import io
+import time
+from Backend.app.services.pdf_service import PDFReportService, ReportTemplate
+
+SAMPLE_ANALYSIS = {
+    "primary_finding": {"condition": "Tooth Agenesis", "confidence_percentage": 87.4, "level": "High"},
+    "all_findings": [
+        {"condition": "Tooth Agenesis", "confidence_percentage": 87.4, "level": "High"},
+        {"condition": "Caries", "confidence_percentage": 6.1, "level": "Low"},
+        {"condition": "Gingivitis", "confidence_percentage": 3.9, "level": "Low"},
+        {"condition": "Ulcer", "confidence_percentage": 1.6, "level": "Low"},
+        {"condition": "Healthy", "confidence_percentage": 1.0, "level": "Low"},
+    ],
+    "explanation": {
+        "explanation": (
+            "**What this means:** One or more teeth appear to be missing from development.\n"
+            "\n"
+            "* Ask your dentist about replacement options\n"
+            "* Keep the surrounding teeth healthy\n"
+            "1. Book an appointment within a week\n"
+            "2. Bring any previous X-rays"
+        ),
+        "recommendations": [],
+    },
+}
+
+
+def run(reports: int, reuse_template: bool) -> float:
+    service = PDFReportService(workers=0)
+    start = time.perf_counter()
+    for _ in range(reports):
+        if not reuse_template:
+            service = PDFReportService(ReportTemplate(), workers=0)
+        service.generate_report("Benchmark Patient", SAMPLE_ANALYSIS, io.BytesIO())
+    return reports / (time.perf_counter() - start)
+
+
+def run_pooled(reports: int, workers: int) -> float:
+    service = PDFReportService(workers=workers)
+    try:
+        # Start the worker processes before timing
+        service.render_report("Warm-up", SAMPLE_ANALYSIS)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as callers:
+            list(callers.map(lambda _: service.render_report("Benchmark Patient", SAMPLE_ANALYSIS), range(reports)))
+        return reports / (time.perf_counter() - start)
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=0, help="also benchmark a process pool of this size")
+    args = parser.parse_args()
+
+    # One untimed render so font and module loading don't count against either run
+    PDFReportService(workers=0).generate_report("Warm-up", SAMPLE_ANALYSIS, io.BytesIO())
+
+    fresh = run(args.reports, reuse_template=False)
+    shared = run(args.reports, reuse_template=True)
+    print(f"fresh template per report: {fresh:8.1f} reports/sec")
+    print(f"shared template:           {shared:8.1f} reports/sec  ({shared / fresh:.2f}x)")
+    if args.workers:
+        pooled = run_pooled(args.reports, args.workers)
+        print(f"process pool ({args.workers} workers): {pooled:8.1f} reports/sec  ({pooled / shared:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
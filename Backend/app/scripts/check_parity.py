@@ -0,0 +1,84 @@
+"""Compare a vision backend against the eager PyTorch model on a folder of images.
+
+Fails (exit code 1) when top-1 agreement drops below --min-agreement or any
+class probability drifts more than --max-drift from the eager result.
+With --preprocess, instead compares the fast NumPy preprocessing path with
+the HF image processor and fails when any pixel differs by more than
+--max-pixel-error.
+
+Usage:
+    python -m Backend.app.scripts.check_parity --images path/to/fixtures --backend onnx
+    python -m Backend.app.scripts.check_parity --images path/to/fixtures --preprocess
+"""
+import argparse
+import os
+import sys
+import numpy as np
+from Backend.app.services.vision_service import DentalVisionService, create_backend
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_images(folder: str) -> dict:
+    images = {}
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), "rb") as f:
+                images[name] = f.read()
+    return images
+
+
+def check(images: dict, backend: str, max_drift: float, min_agreement: float) -> bool:
+    service = DentalVisionService(backend="torch")
+    candidate = create_backend(backend)
+
+    agree = 0
+    worst_drift = 0.0
+    for name, image_bytes in images.items():
+        pixel_values = service._prepare(image_bytes)
+        expected = service.backend(pixel_values)[0]
+        actual = candidate(pixel_values)[0]
+
+        drift = float(np.abs(expected - actual).max())
+        same_top = int(np.argmax(expected)) == int(np.argmax(actual))
+        agree += same_top
+        worst_drift = max(worst_drift, drift)
+        print(f"{name}: top1 {'ok' if same_top else 'MISMATCH'}, max drift {drift:.4f}")
+
+    agreement = agree / len(images)
+    print(f"\n{backend} vs torch on {len(images)} images: "
+          f"top-1 agreement {agreement:.2%}, worst drift {worst_drift:.4f}")
+    return agreement >= min_agreement and worst_drift <= max_drift
+
+
+def check_preprocess(images: dict, max_pixel_error: float) -> bool:
+    service = DentalVisionService(backend="torch")
+
+    worst = 0.0
+    for name, image_bytes in images.items():
+        expected = service._prepare_reference(image_bytes)
+        actual = service.preprocessor(image_bytes)
+        error = float(np.abs(expected - actual).max())
+        worst = max(worst, error)
+        print(f"{name}: shape {actual.shape}, max pixel error {error:.4f}")
+
+    print(f"\nFast preprocessing vs HF processor on {len(images)} images: worst pixel error {worst:.4f}")
+    return worst <= max_pixel_error
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder of fixture images")
+    parser.add_argument("--backend", default="onnx", choices=["torch-int8", "onnx"])
+    parser.add_argument("--max-drift", type=float, default=0.05)
+    parser.add_argument("--min-agreement", type=float, default=1.0)
+    parser.add_argument("--preprocess", action="store_true", help="Check preprocessing instead of a backend")
+    parser.add_argument("--max-pixel-error", type=float, default=0.1)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+    if args.preprocess:
+        sys.exit(0 if check_preprocess(images, args.max_pixel_error) else 1)
+    sys.exit(0 if check(images, args.backend, args.max_drift, args.min_agreement) else 1)
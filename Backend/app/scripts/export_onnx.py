@@ -0,0 +1,48 @@
+"""Export the SigLIP classifier to ONNX for the `onnx` vision backend.
+
+Usage:
+    python -m Backend.app.scripts.export_onnx --output exported_models/tooth-agenesis-siglip2.onnx
+"""
+from transformers import AutoImageProcessor, SiglipForImageClassification
+import argparse
+import os
+import torch
+from Backend.app.services.vision_service import MODEL_NAME, DEFAULT_ONNX_PATH
+
+
+class LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export(output: str, opset: int = 17):
+    processor = AutoImageProcessor.from_pretrained(MODEL_NAME)
+    model = SiglipForImageClassification.from_pretrained(MODEL_NAME)
+    model.eval()
+
+    size = processor.size
+    dummy = torch.zeros(1, 3, size["height"], size["width"], dtype=torch.float32)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    torch.onnx.export(
+        LogitsOnly(model),
+        (dummy,),
+        output,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    print(f"Exported {MODEL_NAME} to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.getenv("VISION_ONNX_PATH", DEFAULT_ONNX_PATH))
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    export(args.output, args.opset)
@@ -0,0 +1,167 @@
+from collections import OrderedDict, deque
+import asyncio
+import math
+import time
+
+
+class AdmissionRejected(Exception):
+    """No inference slot within the deadline; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy, retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent inferences and queues the excess fairly, per key (patient).
+
+    Up to `max_concurrent` callers hold a slot at once. The rest wait in
+    one queue per key, and freed slots go round-robin across keys, so one
+    patient's bulk upload delays everyone else by at most one request per
+    turn. A caller is rejected straight away with AdmissionRejected when
+    any of these holds:
+
+    - the queue is full;
+    - its key already has `max_queue_per_key` requests waiting;
+    - the expected wait is longer than `max_wait`.
+
+    It is also rejected if it does wait `max_wait` without getting a slot.
+    The expected wait comes from a moving average of how long slots are held.
+
+    All state belongs to the event loop. Sync code, including anything
+    reading `stats`, calls in through anyio's from_thread.
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 64, max_queue_per_key: int = 16,
+                 max_wait: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.max_wait = max_wait
+
+        self._active = 0
+        # key -> waiters, in the order keys get their next turn
+        self._waiting = OrderedDict()
+        self._queued = 0
+        self._service_time = None
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.max_queued = 0
+        self.waited = 0
+        self.wait_time_total = 0.0
+        self.rejected = {"queue_full": 0, "patient_queue_full": 0, "deadline": 0}
+
+    def expected_wait(self, key) -> float:
+        """Seconds a new request for `key` would wait for a slot, or None before anything was measured."""
+        if self._active < self.max_concurrent and not self._queued:
+            return 0.0
+        if self._service_time is None:
+            return None
+        queue = self._waiting.get(key)
+        mine = len(queue) if queue else 0
+        # Round-robin: every other key gets at most one turn per request of ours already waiting
+        ahead = mine + sum(min(len(other), mine + 1) for k, other in self._waiting.items() if k != key)
+        return (ahead + 1) * self._service_time / self.max_concurrent
+
+    def _reject(self, reason: str, expected: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, max(1, math.ceil(expected or 0)))
+
+    def check(self, key):
+        """Raise AdmissionRejected if a request for `key` would be turned away right now.
+
+        Lets an endpoint refuse before it reads a large request body.
+        """
+        if self._active < self.max_concurrent and not self._queued:
+            return
+        expected = self.expected_wait(key)
+        if self._queued >= self.max_queue:
+            self._reject("queue_full", expected)
+        queue = self._waiting.get(key)
+        if queue and len(queue) >= self.max_queue_per_key:
+            self._reject("patient_queue_full", expected)
+        if expected is not None and expected > self.max_wait:
+            self._reject("deadline", expected)
+
+    async def acquire(self, key) -> float:
+        """Wait for a slot; returns a ticket to hand back to `release`."""
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            self.admitted += 1
+            return time.monotonic()
+
+        self.check(key)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, deque()).append(waiter)
+        self._queued += 1
+        self.queued_total += 1
+        self.max_queued = max(self.max_queued, self._queued)
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the caller gave up: pass it on
+                self._active -= 1
+                self._dispatch()
+            else:
+                self._remove(key, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("deadline", self.expected_wait(key))
+            raise
+        self.admitted += 1
+        self.waited += 1
+        self.wait_time_total += time.monotonic() - start
+        return time.monotonic()
+
+    def release(self, ticket: float):
+        held = time.monotonic() - ticket
+        self._service_time = held if self._service_time is None else 0.8 * self._service_time + 0.2 * held
+        self._active -= 1
+        self._dispatch()
+
+    def _remove(self, key, waiter):
+        queue = self._waiting.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._waiting[key]
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._waiting:
+            key, queue = next(iter(self._waiting.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                # This key's turn is used; it goes to the back
+                self._waiting.move_to_end(key)
+            else:
+                del self._waiting[key]
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        expected = self.expected_wait(None)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_queue_per_patient": self.max_queue_per_key,
+            "max_wait_seconds": self.max_wait,
+            "in_flight": self._active,
+            "queued": self._queued,
+            "waiting_patients": len(self._waiting),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected": dict(self.rejected),
+            "avg_wait_ms": round(self.wait_time_total / self.waited * 1000, 2) if self.waited else 0.0,
+            "avg_service_ms": round(self._service_time * 1000, 2) if self._service_time is not None else None,
+            "expected_wait_ms": round(expected * 1000, 2) if expected is not None else None,
+        }
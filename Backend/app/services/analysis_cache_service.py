@@ -0,0 +1,102 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from Backend.app.models.patient import CachedAnalysis
+from Backend.app.services.cache_service import LRUCache
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def hash_image(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class AnalysisCacheService:
+    """Two-tier cache of vision results keyed by image content hash.
+
+    Tier one is an in-process LRU, tier two the `analysis_cache` table.
+    Entries are scoped to the model name, so switching models never serves
+    probabilities produced by a different model.
+    """
+
+    def __init__(self, model_name: str, maxsize: int = 2048):
+        self.model_name = model_name
+        self.memory = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.db_hits = 0
+        self.db_misses = 0
+
+    def _key(self, content_hash: str):
+        return (self.model_name, content_hash)
+
+    def get(self, db: Session, content_hash: str):
+        key = self._key(content_hash)
+        result = self.memory.get(key)
+        if result is not None:
+            return result
+
+        row = db.query(CachedAnalysis).filter(
+            CachedAnalysis.content_hash == content_hash,
+            CachedAnalysis.model_name == self.model_name
+        ).first()
+
+        with self._lock:
+            if row is None:
+                self.db_misses += 1
+                return None
+            self.db_hits += 1
+
+        result = {
+            "success": True,
+            "top_prediction": {
+                "class": row.prediction,
+                "confidence": row.confidence
+            },
+            "all_probabilities": row.all_probabilities,
+        }
+        self.memory.set(key, result)
+        return result
+
+    def put(self, db: Session, content_hash: str, result: dict):
+        """Store a result; the row is written as part of the caller's transaction."""
+        cached = {
+            "success": True,
+            "top_prediction": result["top_prediction"],
+            "all_probabilities": result["all_probabilities"],
+        }
+        self.memory.set(self._key(content_hash), cached)
+
+        # Two uploads of the same image may race; the first one wins
+        db.execute(
+            insert(CachedAnalysis).values(
+                content_hash=content_hash,
+                model_name=self.model_name,
+                prediction=result["top_prediction"]["class"],
+                confidence=result["top_prediction"]["confidence"],
+                all_probabilities=result["all_probabilities"]
+            ).on_conflict_do_nothing(constraint="uq_analysis_cache_hash_model")
+        )
+
+    def invalidate(self, db: Session, stale_only: bool = True) -> int:
+        """Drop cached results. With `stale_only`, only entries from other models are removed."""
+        if stale_only:
+            self.memory.discard_where(lambda key: key[0] != self.model_name)
+            query = db.query(CachedAnalysis).filter(CachedAnalysis.model_name != self.model_name)
+        else:
+            self.memory.clear()
+            query = db.query(CachedAnalysis)
+
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"Invalidated {deleted} cached analyses")
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "memory": self.memory.stats(),
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+        }
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import io
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Requested widths snap up to one of these so the cache holds a handful of variants per image
+DERIVATIVE_WIDTHS = (128, 256, 512, 1024)
+# format query value -> (PIL format, media type, extension, save options)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp", {"quality": 75, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+class DerivativeService:
+    """Resized and transcoded variants of stored images, kept in a bounded DiskCache.
+
+    Variants are keyed on the stored file's name, which is the content hash
+    for images in the image store, so duplicate uploads share them as
+    well. Images are only ever scaled down, and metadata such as EXIF is
+    not copied over. `pregenerate` renders the standard variants in the
+    background right after an upload, so the first history view is a
+    cache hit.
+    """
+
+    def __init__(self, cache, pregenerate: list = ()):
+        self.cache = cache
+        self.pregenerate_variants = list(pregenerate)
+        # One thread: pre-generation is best effort and must not compete with requests
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="derivatives")
+
+    @staticmethod
+    def snap_width(width: int = None):
+        if width is None:
+            return None
+        for standard in DERIVATIVE_WIDTHS:
+            if width <= standard:
+                return standard
+        return DERIVATIVE_WIDTHS[-1]
+
+    def key_for(self, source_path: str, width: int, fmt: str) -> str:
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        size = f"w{width}" if width else "full"
+        return f"{stem}_{size}{DERIVATIVE_FORMATS[fmt][2]}"
+
+    def render(self, source_path: str, width: int, fmt: str) -> bytes:
+        pil_format, _, _, options = DERIVATIVE_FORMATS[fmt]
+        with Image.open(source_path) as image:
+            if width and image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                # JPEG can decode straight at a reduced scale, skipping most of the work
+                image.draft("RGB", (width, height))
+                image = image.convert("RGB").resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+        return buffer.getvalue()
+
+    def get(self, source_path: str, width: int, fmt: str) -> tuple:
+        """Return (path, bytes_or_None, media_type) for a variant, rendering it on a miss."""
+        width = self.snap_width(width)
+        path, data = self.cache.get_or_render(
+            self.key_for(source_path, width, fmt),
+            lambda: self.render(source_path, width, fmt)
+        )
+        return path, data, DERIVATIVE_FORMATS[fmt][1]
+
+    def _pregenerate(self, source_path: str):
+        for width, fmt in self.pregenerate_variants:
+            try:
+                self.get(source_path, width, fmt)
+            except Exception as e:
+                logger.warning(f"Pre-generating {fmt} w{width} for {source_path} failed: {e}")
+
+    def pregenerate(self, source_path: str):
+        if self.pregenerate_variants:
+            self._executor.submit(self._pregenerate, source_path)
+
+    def stats(self) -> dict:
+        return {
+            "widths": list(DERIVATIVE_WIDTHS),
+            "pregenerate": [f"{fmt}:{width}" for width, fmt in self.pregenerate_variants],
+            "pregenerate_queue": self._executor._work_queue.qsize(),
+            "cache": self.cache.stats(),
+        }
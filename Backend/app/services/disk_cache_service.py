@@ -0,0 +1,157 @@
+from Backend.app.services.singleflight import SingleFlight
+import os
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: bytes):
+    """Write `data` to `path` so readers see either the old file, no file or the whole new one."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Hidden temp name in the same directory so the rename is atomic
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class DiskCache:
+    """Size-bounded directory of generated files with LRU eviction.
+
+    Files are rendered on first request by a caller-supplied function that
+    returns their bytes, and written under a temporary name before being
+    renamed into place, so readers never see a partial file. Concurrent
+    first requests for one key share a single render. Access refreshes a
+    file's mtime, and when the directory grows past `max_bytes` the least
+    recently used files are removed; they are simply rendered again on
+    their next request.
+
+    A path handed out by `get` is opened later, by the response (or the
+    proxy, in sendfile mode). Files used in the last `min_age` seconds are
+    never evicted, so that path is still there when it is opened, whichever
+    worker trims the directory. The directory can go over `max_bytes` by
+    what is served within that window.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = "", min_age: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.min_age = min_age
+        os.makedirs(directory, exist_ok=True)
+
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._size = self._scan_size()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def _scan_size(self) -> int:
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    total += entry.stat().st_size
+        return total
+
+    def get(self, key: str):
+        """Return the cached path and mark it used, or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self.hits += 1
+        return path
+
+    def get_or_render(self, key: str, render) -> tuple:
+        """Return (path, data) for `key`, calling `render()` for the bytes if it's missing.
+
+        `data` is the freshly rendered content, shared with every caller
+        that waited on the same render, or None when the file was already
+        cached. Callers holding `data` can answer from memory without
+        re-reading a file that eviction may already have removed.
+        """
+        path = self.get(key)
+        if path:
+            return path, None
+        return self._flight.do(key, lambda: self._create(key, render))
+
+    def _create(self, key: str, render) -> tuple:
+        path = self.path_for(key)
+        # Another caller may have finished between our miss and taking the flight
+        if os.path.exists(path):
+            return path, None
+
+        self.misses += 1
+        data = render()
+        write_atomic(path, data)
+
+        with self._lock:
+            self._size += len(data)
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self._evict(keep=path)
+        return path, data
+
+    def discard(self, key: str):
+        path = self.path_for(key)
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self, keep: str):
+        with self._lock:
+            # Other workers share the directory, so recount instead of trusting our tally
+            entries = []
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            in_use = time.time() - self.min_age
+
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes or mtime >= in_use:
+                    # Sorted by mtime: everything from here on was just used
+                    break
+                if os.path.abspath(path) == os.path.abspath(keep):
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+            self._size = total
+        logger.info(f"Disk cache {self.directory} trimmed to {total} bytes")
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "render_coalesced": self._flight.coalesced,
+        }
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import func
+from Backend.app.database import SessionLocal
+from Backend.app.models.patient import CachedExplanation
+from Backend.app.services.cache_service import LRUCache
+import math
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExplanationCache:
+    """Two-tier cache of LLM explanation text keyed on bucketed findings.
+
+    The key is the prediction, the risk level, the confidence rounded down
+    to `bucket` and the top-3 differential at the same granularity, so
+    uploads with practically identical findings share one explanation.
+    Tier one is an in-process LRU with TTL, tier two the
+    `explanation_cache` table.
+    """
+
+    def __init__(self, bucket: float = 0.05, maxsize: int = 1024, ttl: float = 86400):
+        self.bucket = bucket
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.db_hits = 0
+        self.db_misses = 0
+        self.db_errors = 0
+
+    def _bucketed(self, value: float) -> int:
+        # The epsilon keeps values on a boundary in their own bucket: 0.15 / 0.05 is 2.9999999999999996
+        return math.floor(value / self.bucket + 1e-9)
+
+    def key_for(self, summary: dict) -> str:
+        differential = ",".join(
+            f"{condition}:{self._bucketed(prob)}" for condition, prob in summary["sorted_findings"]
+        )
+        # Granularity is part of the key so changing it never serves mismatched entries
+        return (
+            f"g{self.bucket}|{summary['prediction']}|{summary['risk']}|"
+            f"{self._bucketed(summary['confidence'])}|{differential}"
+        )
+
+    def get(self, key: str):
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+
+        db = SessionLocal()
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+            row = db.query(CachedExplanation).filter(
+                CachedExplanation.cache_key == key,
+                CachedExplanation.created_at >= cutoff
+            ).first()
+        except Exception as e:
+            logger.warning(f"Explanation cache lookup failed: {e}")
+            with self._lock:
+                self.db_errors += 1
+            return None
+        finally:
+            db.close()
+
+        with self._lock:
+            if row is None:
+                self.db_misses += 1
+                return None
+            self.db_hits += 1
+
+        self.memory.set(key, row.explanation)
+        return row.explanation
+
+    def put(self, key: str, text: str):
+        self.memory.set(key, text)
+
+        db = SessionLocal()
+        try:
+            stmt = insert(CachedExplanation).values(cache_key=key, explanation=text)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[CachedExplanation.cache_key],
+                set_={"explanation": stmt.excluded.explanation, "created_at": func.now()}
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Explanation cache write failed: {e}")
+            with self._lock:
+                self.db_errors += 1
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.db_hits
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "bucket": self.bucket,
+            "ttl_seconds": self.ttl,
+            "memory": memory,
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "db_errors": self.db_errors,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
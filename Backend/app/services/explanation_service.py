@@ -1,28 +1,58 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from dotenv import load_dotenv
 import logging
+from fastapi.concurrency import run_in_threadpool
+from Backend.app.services.explanation_cache_service import ExplanationCache
+from Backend.app.services.llm_client import CircuitBreaker, FakeLLM, LLMUnavailable, ResilientLLMClient
+from Backend.app.services.singleflight import AsyncSingleFlight
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 class ExplanationService:
     def __init__(self):
+        self.llm = self._create_llm()
+        self.client = None
+        if self.llm:
+            # Without a fixed delay, hedges fire once a call outlives the observed p95
+            hedge_after = os.getenv("EXPLANATION_LLM_HEDGE_AFTER")
+            self.client = ResilientLLMClient(
+                self.llm,
+                deadline=float(os.getenv("EXPLANATION_LLM_DEADLINE", "10")),
+                hedge=os.getenv("EXPLANATION_LLM_HEDGE", "false").lower() == "true",
+                hedge_after=float(hedge_after) if hedge_after else None,
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("EXPLANATION_LLM_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("EXPLANATION_LLM_BREAKER_RESET", "30"))
+                )
+            )
+        
+        self.singleflight = AsyncSingleFlight()
+        self.cache = ExplanationCache(
+            bucket=float(os.getenv("EXPLANATION_CACHE_BUCKET", "0.05")),
+            maxsize=int(os.getenv("EXPLANATION_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("EXPLANATION_CACHE_TTL", "86400"))
+        )
+    
+    def _create_llm(self):
+        if os.getenv("EXPLANATION_LLM", "gemini") == "fake":
+            return FakeLLM(delay=float(os.getenv("EXPLANATION_FAKE_LLM_DELAY", "0")))
+        
         api_key = os.getenv("gemini")
         if not api_key:
             logger.warning("Gemini API key not found")
-            self.llm = None
-        else:
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=api_key,
-                temperature=0.3,
-                convert_system_message_to_human=True
-            )
-    
-    def generate_explanation(self, prediction: str, confidence: float, all_probabilities: dict):
-        """Generate AI explanation using Gemini"""
+            return None
         
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            google_api_key=api_key,
+            temperature=0.3,
+            convert_system_message_to_human=True
+        )
+    
+    def _summarize(self, prediction: str, confidence: float, all_probabilities: dict) -> dict:
+        """Everything the prompt and the response are built from."""
         confidence_pct = round(confidence * 100, 1)
         
         sorted_findings = sorted(
@@ -31,16 +61,6 @@ class ExplanationService:
             reverse=True
         )[:3]
         
-        top_findings_text = ", ".join([
-            f"{f[0]} ({round(f[1]*100,1)}%)" 
-            for f in sorted_findings
-        ])
-        
-        all_probs_text = ", ".join([
-            f"{k}: {round(v*100,1)}%" 
-            for k, v in all_probabilities.items()
-        ])
-        
         if confidence > 0.8:
             risk = "high"
             urgency = "See a dentist within a week"
@@ -51,15 +71,32 @@ class ExplanationService:
             risk = "low"
             urgency = "Monitor and discuss at next regular checkup"
         
-        if not self.llm:
-            return self._get_template_explanation(prediction, confidence_pct, risk, urgency)
+        return {
+            "prediction": prediction,
+            "confidence": confidence,
+            "confidence_pct": confidence_pct,
+            "all_probabilities": all_probabilities,
+            "sorted_findings": sorted_findings,
+            "risk": risk,
+            "urgency": urgency
+        }
+    
+    def _build_prompt(self, summary: dict) -> str:
+        top_findings_text = ", ".join([
+            f"{f[0]} ({round(f[1]*100,1)}%)" 
+            for f in summary["sorted_findings"]
+        ])
         
-        try:
-            prompt = f"""
+        all_probs_text = ", ".join([
+            f"{k}: {round(v*100,1)}%" 
+            for k, v in summary["all_probabilities"].items()
+        ])
+        
+        return f"""
 You are a dental AI assistant explaining analysis results to a patient.
 
 Analysis Results:
-- Primary finding: {prediction} with {confidence_pct}% confidence
+- Primary finding: {summary["prediction"]} with {summary["confidence_pct"]}% confidence
 - All findings: {all_probs_text}
 - Top 3 possibilities: {top_findings_text}
 
@@ -71,25 +108,121 @@ Provide a helpful, empathetic explanation including:
 
 Keep it clear and concise.
 """
-            
-            response = self.llm.invoke(prompt)
-            explanation_text = response.content if hasattr(response, 'content') else str(response)
-            
-            return {
-                "condition": prediction,
-                "confidence_percentage": confidence_pct,
-                "risk_level": risk,
-                "urgency": urgency,
-                "ai_generated": True,
-                "explanation": explanation_text,
-                "differential": [
-                    {"condition": f[0], "confidence": round(f[1]*100, 1)} 
-                    for f in sorted_findings if f[0] != prediction
-                ]
-            }
-        except Exception as e:
+    
+    def _build_response(self, summary: dict, explanation_text: str) -> dict:
+        prediction = summary["prediction"]
+        return {
+            "condition": prediction,
+            "confidence_percentage": summary["confidence_pct"],
+            "risk_level": summary["risk"],
+            "urgency": summary["urgency"],
+            "ai_generated": True,
+            "explanation": explanation_text,
+            "differential": [
+                {"condition": f[0], "confidence": round(f[1]*100, 1)} 
+                for f in summary["sorted_findings"] if f[0] != prediction
+            ]
+        }
+    
+    def _template_for(self, summary: dict) -> dict:
+        return self._get_template_explanation(
+            summary["prediction"], summary["confidence_pct"], summary["risk"], summary["urgency"]
+        )
+    
+    def generate_explanation(self, prediction: str, confidence: float, all_probabilities: dict):
+        """Generate AI explanation using Gemini"""
+        
+        summary = self._summarize(prediction, confidence, all_probabilities)
+        
+        if not self.llm:
+            return self._template_for(summary)
+        
+        # Similar findings get the same explanation; skip the LLM round trip on a hit
+        cache_key = self.cache.key_for(summary)
+        cached_text = self.cache.get(cache_key)
+        if cached_text is not None:
+            return self._build_response(summary, cached_text)
+        
+        try:
+            explanation_text = self.client.invoke(self._build_prompt(summary))
+        except LLMUnavailable as e:
+            logger.error(f"Gemini error: {e}")
+            return self._template_for(summary)
+        
+        self.cache.put(cache_key, explanation_text)
+        return self._build_response(summary, explanation_text)
+    
+    async def agenerate_explanation(self, prediction: str, confidence: float, all_probabilities: dict):
+        """Async variant: bounded by the LLM deadline, falls back to the template explanation."""
+        
+        summary = self._summarize(prediction, confidence, all_probabilities)
+        
+        if not self.llm:
+            return self._template_for(summary)
+        
+        cache_key = self.cache.key_for(summary)
+        cached_text = await run_in_threadpool(self.cache.get, cache_key)
+        if cached_text is not None:
+            return self._build_response(summary, cached_text)
+        
+        # Identical prompts already in flight share one LLM call (and one cache write)
+        prompt = self._build_prompt(summary)
+        
+        async def call_llm():
+            text = await self.client.ainvoke(prompt)
+            await run_in_threadpool(self.cache.put, cache_key, text)
+            return text
+        
+        try:
+            explanation_text = await self.singleflight.do(" ".join(prompt.split()), call_llm)
+        except LLMUnavailable as e:
             logger.error(f"Gemini error: {e}")
-            return self._get_template_explanation(prediction, confidence_pct, risk, urgency)
+            return self._template_for(summary)
+        
+        return self._build_response(summary, explanation_text)
+    
+    async def astream_explanation(self, prediction: str, confidence: float, all_probabilities: dict):
+        """Streaming variant yielding ("token", text) chunks, then ("done", explanation).
+
+        The final "done" explanation is authoritative: if the LLM fails
+        mid-stream it is the template explanation, not the partial text.
+        """
+        
+        summary = self._summarize(prediction, confidence, all_probabilities)
+        parts = []
+        
+        if self.llm:
+            cache_key = self.cache.key_for(summary)
+            cached_text = await run_in_threadpool(self.cache.get, cache_key)
+            if cached_text is not None:
+                yield "token", cached_text
+                yield "done", self._build_response(summary, cached_text)
+                return
+            
+            try:
+                async for text in self.client.astream(self._build_prompt(summary)):
+                    parts.append(text)
+                    yield "token", text
+            except LLMUnavailable as e:
+                logger.error(f"Gemini error: {e}")
+            else:
+                explanation_text = "".join(parts)
+                await run_in_threadpool(self.cache.put, cache_key, explanation_text)
+                yield "done", self._build_response(summary, explanation_text)
+                return
+        
+        template = self._template_for(summary)
+        if not parts:
+            yield "token", template["explanation"]
+        yield "done", template
+    
+    def stats(self) -> dict:
+        return {
+            "llm": "configured" if self.llm else "template_only",
+            "client": self.client.stats() if self.client else None,
+            "coalescing": self.singleflight.stats(),
+            "cache": self.cache.stats()
+        }
     
     def _get_template_explanation(self, prediction, confidence_pct, risk, urgency):
         """Fallback template explanations"""
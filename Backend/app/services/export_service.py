@@ -0,0 +1,75 @@
+from datetime import datetime
+import os
+import zipfile
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Deflating these costs CPU and saves next to nothing
+PRECOMPRESSED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".webp")
+
+
+class _ZipSink:
+    """Write-only file object that buffers zipfile's output until the generator drains it.
+
+    It has no tell/seek, so zipfile falls back to streaming mode (sizes and
+    CRCs go in data descriptors after each member) and never rewinds.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+def _zip_info(arcname: str, modified: datetime, compress_type: int) -> zipfile.ZipInfo:
+    # Zip timestamps can't predate 1980
+    modified = modified or datetime.now()
+    info = zipfile.ZipInfo(arcname, date_time=max(modified.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+    info.compress_type = compress_type
+    return info
+
+
+def stream_zip(entries, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield a zip archive of `entries` piece by piece, without a temp file.
+
+    `entries` is an iterable of (arcname, source, modified) where `source`
+    is a file path or bytes. Files are copied `chunk_size` at a time, so
+    memory stays flat however large the archive gets; only the central
+    directory (one small record per member) is held until the end. Images
+    and PDFs are already compressed, so they are stored as-is, whether
+    they come from a path or from bytes; only other members, such as the
+    manifest, are deflated.
+    """
+    return (chunk for chunk in _zip_chunks(entries, chunk_size) if chunk)
+
+
+def _zip_chunks(entries, chunk_size: int):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as archive:
+        for arcname, source, modified in entries:
+            if isinstance(source, bytes):
+                compress_type = (
+                    zipfile.ZIP_STORED if arcname.lower().endswith(PRECOMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                )
+                archive.writestr(_zip_info(arcname, modified, compress_type), source)
+            else:
+                info = _zip_info(arcname, modified, zipfile.ZIP_STORED)
+                info.file_size = os.path.getsize(source)
+                with open(source, "rb") as src, archive.open(info, "w") as dest:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield sink.drain()
+            yield sink.drain()
+    # Central directory, written when the archive closes
+    yield sink.drain()
@@ -0,0 +1,201 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from Backend.app.database import SessionLocal
+from Backend.app.models.patient import ImageBlob
+from Backend.app.services.disk_cache_service import write_atomic
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Content-addressed, reference-counted image files.
+
+    A blob lives at `root/ab/cd/<sha256><ext>`, so no directory grows past a
+    few entries, and uploads of the same bytes share one file. The
+    `image_blobs` row counts the PatientImage rows pointing at it. Releasing
+    a reference only decrements the count; blobs that stay unreferenced for
+    `grace` seconds are removed by `collect_garbage`.
+
+    Adding a reference upserts the blob row before the file is placed, and
+    the sweep locks rows before deleting. So an upload and a sweep of the
+    same blob always serialize on that row, and a file is never removed
+    from under a new reference.
+
+    The file is placed before the caller commits, so a transaction that
+    rolls back leaves a file with no row. Placing or reusing a file sets
+    its mtime, and the sweep also removes files that have no row and
+    haven't been touched for `grace` seconds.
+    """
+
+    def __init__(self, root: str, grace: float = 3600):
+        self.root = root
+        self.grace = grace
+        self.staging_dir = os.path.join(root, ".staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.released = 0
+        self.collected = 0
+        self.orphans_removed = 0
+        self.last_sweep = None
+
+    def path_for(self, content_hash: str, extension: str) -> str:
+        return f"{self.root}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}"
+
+    def add(self, db: Session, content_hash: str, extension: str, size: int, mime_type: str,
+            tmp_path: str = None, data: bytes = None) -> str:
+        """Take a reference to the blob for `content_hash`, storing it if new; returns its path.
+
+        The content comes from a staged `tmp_path` (moved into place or
+        dropped) or from `data`. The reference is part of the caller's
+        transaction and the row stays locked until it commits.
+        """
+        path = self.path_for(content_hash, extension)
+        stmt = insert(ImageBlob).values(
+            content_hash=content_hash,
+            file_path=path,
+            size=size,
+            mime_type=mime_type,
+            ref_count=1
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[ImageBlob.content_hash],
+            set_={"ref_count": ImageBlob.ref_count + 1, "updated_at": func.now()}
+        ))
+
+        if os.path.exists(path):
+            if tmp_path:
+                os.unlink(tmp_path)
+            # Keeps the orphan sweep off a file this (not yet committed) reference relies on
+            os.utime(path)
+            with self._lock:
+                self.deduplicated += 1
+            return path
+
+        if tmp_path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            # A resumable upload's part file can be older than the grace period
+            os.utime(path)
+        else:
+            write_atomic(path, data)
+        with self._lock:
+            self.stored += 1
+        return path
+
+    def discard_staged(self, tmp_path: str):
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    def release(self, db: Session, file_paths: list) -> int:
+        """Drop one reference per entry in `file_paths` (part of the caller's transaction).
+
+        Paths outside the store (images uploaded before it existed) have no
+        blob row and are ignored.
+        """
+        released = 0
+        for path, count in Counter(p for p in file_paths if p).items():
+            released += db.query(ImageBlob).filter(ImageBlob.file_path == path).update(
+                {"ref_count": ImageBlob.ref_count - count, "updated_at": func.now()},
+                synchronize_session=False
+            ) * count
+        with self._lock:
+            self.released += released
+        return released
+
+    def _orphaned_files(self, db: Session, stale: float, limit: int) -> list:
+        """Files under the store untouched since `stale` whose hash has no blob row."""
+        orphans = []
+        for top in os.scandir(self.root):
+            # .staging and .partial belong to uploads in progress
+            if not top.is_dir() or top.name.startswith("."):
+                continue
+            for shard in os.scandir(top.path):
+                if not shard.is_dir():
+                    continue
+                candidates = {}
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.startswith(".") and entry.stat().st_mtime < stale:
+                        candidates[os.path.splitext(entry.name)[0]] = entry.path
+                if not candidates:
+                    continue
+                known = {row.content_hash for row in db.query(ImageBlob.content_hash).filter(
+                    ImageBlob.content_hash.in_(candidates)
+                )}
+                orphans.extend(path for content_hash, path in candidates.items() if content_hash not in known)
+                if len(orphans) >= limit:
+                    return orphans[:limit]
+        return orphans
+
+    def collect_garbage(self, limit: int = 500) -> dict:
+        """Delete blobs unreferenced for longer than the grace period, files with no blob row,
+        and stale staged uploads."""
+        db = SessionLocal()
+        removed = 0
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace)
+            # Rows an upload is currently referencing are locked; skip them rather than wait
+            blobs = db.query(ImageBlob).filter(
+                ImageBlob.ref_count <= 0,
+                ImageBlob.updated_at < cutoff
+            ).with_for_update(skip_locked=True).limit(limit).all()
+            for blob in blobs:
+                try:
+                    os.remove(blob.file_path)
+                except FileNotFoundError:
+                    pass
+                db.delete(blob)
+                removed += 1
+            db.commit()
+            orphans = self._orphaned_files(db, time.time() - self.grace, limit)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Placed by uploads whose transaction then rolled back
+        for path in orphans:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        # Leftovers from uploads that died between staging and being stored
+        stale = time.time() - max(self.grace, 3600)
+        with os.scandir(self.staging_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < stale:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+        with self._lock:
+            self.collected += removed
+            self.orphans_removed += len(orphans)
+            self.last_sweep = datetime.now(timezone.utc).isoformat()
+        if removed or orphans:
+            logger.info(f"Image store sweep removed {removed} unreferenced blobs and {len(orphans)} orphaned files")
+        return {"removed": removed, "orphans_removed": len(orphans)}
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "grace_seconds": self.grace,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "released": self.released,
+            "collected": self.collected,
+            "orphans_removed": self.orphans_removed,
+            "last_sweep": self.last_sweep,
+        }
@@ -0,0 +1,277 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailable(Exception):
+    """The LLM was skipped or gave up: circuit open, deadline passed or every attempt failed."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then lets a single trial call through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a half-open trial that ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("LLM circuit breaker opened")
+                self._opened_at = time.monotonic()
+
+
+class FakeLLMResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLM:
+    """Local stand-in for Gemini (EXPLANATION_LLM=fake) with a configurable delay and failure mode."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def _respond(self, prompt: str) -> FakeLLMResponse:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("Fake LLM failure")
+        finding = next((line for line in prompt.splitlines() if "Primary finding" in line), "").strip("- ")
+        return FakeLLMResponse(
+            f"**What this means:** {finding}.\n"
+            "* Keep brushing twice a day\n"
+            "* Book a check-up with your dentist"
+        )
+
+    def invoke(self, prompt: str) -> FakeLLMResponse:
+        time.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> FakeLLMResponse:
+        await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def astream(self, prompt: str):
+        await asyncio.sleep(self.delay)
+        for word in self._respond(prompt).content.split(" "):
+            yield FakeLLMResponse(word + " ")
+
+
+class ResilientLLMClient:
+    """Wraps a LangChain chat model with a per-call deadline, optional hedging
+    and a circuit breaker. Returns the response text or raises LLMUnavailable."""
+
+    def __init__(self, llm, deadline: float = 10.0, hedge: bool = False, hedge_after: float = None,
+                 breaker: CircuitBreaker = None):
+        self.llm = llm
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+        self._latencies = deque(maxlen=200)
+        self._stats_lock = threading.Lock()
+        self._counters = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+                          "short_circuited": 0, "hedges_sent": 0, "hedge_wins": 0}
+        # Sync callers only; bounds how many blocking calls can pile up past their deadline
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._counters[name] += 1
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self._stats_lock:
+            # Not enough history for a meaningful p95 yet
+            if len(self._latencies) < 20:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _record_success(self, elapsed: float):
+        with self._stats_lock:
+            self._latencies.append(elapsed)
+        self._count("successes")
+        self.breaker.record_success()
+
+    @staticmethod
+    def _text(response) -> str:
+        return response.content if hasattr(response, 'content') else str(response)
+
+    async def _race(self, prompt: str) -> str:
+        primary = asyncio.ensure_future(self.llm.ainvoke(prompt))
+        tasks = {primary}
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self._count("hedges_sent")
+                    tasks.add(asyncio.ensure_future(self.llm.ainvoke(prompt)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count("hedge_wins")
+                        return self._text(task.result())
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ainvoke(self, prompt: str) -> str:
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise LLMUnavailable("circuit open")
+
+        self._count("calls")
+        start = time.monotonic()
+        try:
+            text = await asyncio.wait_for(self._race(prompt), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"no response within {self.deadline}s")
+        except Exception as e:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+
+        self._record_success(time.monotonic() - start)
+        return text
+
+    async def astream(self, prompt: str):
+        """Yield text chunks as they arrive.
+
+        The deadline bounds the wait for each chunk rather than the whole
+        answer, so a long but steady response is never cut off. Raises
+        LLMUnavailable on failure, possibly after some chunks were yielded.
+        """
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise LLMUnavailable("circuit open")
+
+        self._count("calls")
+        start = time.monotonic()
+        chunks = self.llm.astream(prompt).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.deadline)
+                except StopAsyncIteration:
+                    break
+                yield self._text(chunk)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"no chunk within {self.deadline}s")
+        except Exception as e:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+        except BaseException:
+            # The consumer went away mid-stream; that says nothing about the LLM
+            self.breaker.release()
+            raise
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+        self._record_success(time.monotonic() - start)
+
+    def invoke(self, prompt: str) -> str:
+        """Blocking variant for callers without an event loop (no hedging)."""
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise LLMUnavailable("circuit open")
+
+        self._count("calls")
+        start = time.monotonic()
+        future = self._executor.submit(self.llm.invoke, prompt)
+        try:
+            response = future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count("timeouts")
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"no response within {self.deadline}s")
+        except Exception as e:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise LLMUnavailable(str(e)) from e
+
+        self._record_success(time.monotonic() - start)
+        return self._text(response)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self._counters)
+            ordered = sorted(self._latencies)
+        counters.update({
+            "circuit": self.breaker.state,
+            "deadline_s": self.deadline,
+            "hedging": self.hedge,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+            "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 1) if len(ordered) >= 20 else None,
+        })
+        return counters
@@ -0,0 +1,198 @@
+"""Out-of-process model server shared by all API workers on a host.
+
+Start it next to uvicorn/gunicorn and point the API at it:
+
+    export MODEL_SERVER_AUTHKEY=<random secret shared by server and API>
+    python -m Backend.app.services.model_server --workers 1
+    VISION_BACKEND=remote uvicorn Backend.app.main:app --workers 4
+
+API workers keep preprocessing local and only ship the model input over a
+Unix socket. The pixel tensor itself travels through a shared-memory block;
+the socket only carries its name and shape. With --workers N the server
+starts N model processes on `<address>.0` ... `<address>.N-1`, and
+MODEL_SERVER_ADDRESSES should list all of them.
+
+Messages are pickled, so whoever can connect can run code in the server.
+MODEL_SERVER_AUTHKEY is therefore required on both sides, and sockets are
+created owner-only (0600) in a directory only the owner can enter (0700).
+"""
+from multiprocessing import Process, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+import argparse
+import itertools
+import os
+import threading
+import logging
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Private to the user running the services, never a shared directory like /tmp
+DEFAULT_ADDRESS = os.path.join(os.getenv("MODEL_SERVER_DIR", os.path.expanduser("~/.teledent")), "vision.sock")
+
+
+def _authkey() -> bytes:
+    authkey = os.getenv("MODEL_SERVER_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("MODEL_SERVER_AUTHKEY must be set for the model server and its clients")
+    return authkey.encode("utf-8")
+
+
+def _listen(address: str, authkey: bytes) -> Listener:
+    """Bind `address` readable and writable by the owner only, inside an owner-only directory."""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if os.stat(directory).st_mode & 0o077:
+        raise RuntimeError(f"Model server directory {directory} must not be accessible to other users (chmod 700)")
+    if os.path.exists(address):
+        os.unlink(address)
+    # The umask covers the moment between bind and chmod
+    previous = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(previous)
+    os.chmod(address, 0o600)
+    return listener
+
+
+class RemoteBackend:
+    """Vision backend that forwards batches to one or more model server processes."""
+
+    def __init__(self, addresses: list = None):
+        self._authkey = _authkey()
+        if addresses is None:
+            addresses = os.getenv("MODEL_SERVER_ADDRESSES", DEFAULT_ADDRESS).split(",")
+        self.addresses = [address.strip() for address in addresses if address.strip()]
+        self._next_address = itertools.cycle(self.addresses)
+        self._address_lock = threading.Lock()
+        # multiprocessing connections are not thread-safe, so each thread keeps its own
+        self._local = threading.local()
+
+        info = self._request(self.addresses[0], {"op": "info"})
+        self.name = info["backend"]
+
+    def _connection(self, address: str):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get(address)
+        if conn is None:
+            conn = connections[address] = Client(address, family="AF_UNIX", authkey=self._authkey)
+        return conn
+
+    def _drop_connection(self, address: str):
+        conn = self._local.connections.pop(address, None)
+        if conn is not None:
+            conn.close()
+
+    def _request(self, address: str, message: dict):
+        # One retry covers a server restart that left us with a dead socket
+        for attempt in range(2):
+            try:
+                conn = self._connection(address)
+                conn.send(message)
+                status, payload = conn.recv()
+                break
+            except (OSError, EOFError):
+                self._drop_connection(address)
+                if attempt:
+                    raise RuntimeError(f"Model server at {address} is unavailable")
+
+        if status != "ok":
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def __call__(self, pixel_values: np.ndarray) -> np.ndarray:
+        pixel_values = np.ascontiguousarray(pixel_values, dtype=np.float32)
+        with self._address_lock:
+            address = next(self._next_address)
+
+        shm = SharedMemory(create=True, size=pixel_values.nbytes)
+        try:
+            np.ndarray(pixel_values.shape, dtype=np.float32, buffer=shm.buf)[:] = pixel_values
+            probs = self._request(address, {"op": "infer", "shm": shm.name, "shape": pixel_values.shape})
+        finally:
+            shm.close()
+            shm.unlink()
+        return np.asarray(probs, dtype=np.float32)
+
+
+def _handle(conn, backend, batcher):
+    try:
+        while True:
+            message = conn.recv()
+            try:
+                if message["op"] == "info":
+                    conn.send(("ok", {"backend": backend.name}))
+                    continue
+
+                shm = SharedMemory(name=message["shm"])
+                # The client owns the block; stop our tracker from unlinking it at exit
+                resource_tracker.unregister(shm._name, "shared_memory")
+                try:
+                    pixel_values = np.ndarray(message["shape"], dtype=np.float32, buffer=shm.buf).copy()
+                finally:
+                    shm.close()
+
+                futures = [batcher.submit(pixel_values[i:i + 1]) for i in range(len(pixel_values))]
+                conn.send(("ok", [future.result().tolist() for future in futures]))
+            except Exception as e:
+                logger.error(f"Model server request failed: {e}")
+                conn.send(("error", str(e)))
+    except (EOFError, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+def serve(address: str, backend_name: str):
+    # Refuse to start without a key, before loading anything
+    authkey = _authkey()
+    from Backend.app.services.batching_service import BatchingInferenceQueue
+    from Backend.app.services.vision_service import create_backend
+
+    logging.basicConfig(level=logging.INFO)
+    backend = create_backend(backend_name)
+    # Batches from different API workers are merged here as well
+    batcher = BatchingInferenceQueue(
+        lambda items: list(backend(np.concatenate(items, axis=0))),
+        max_batch_size=int(os.getenv("VISION_MAX_BATCH_SIZE", "8")),
+        max_wait_ms=float(os.getenv("VISION_MAX_WAIT_MS", "10")),
+        name="model-server"
+    )
+
+    with _listen(address, authkey) as listener:
+        logger.info(f"Model server ({backend.name}) listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected model server connection: {e}")
+                continue
+            threading.Thread(target=_handle, args=(conn, backend, batcher), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=DEFAULT_ADDRESS)
+    parser.add_argument("--backend", default=os.getenv("MODEL_SERVER_BACKEND", "torch"),
+                        choices=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    _authkey()
+
+    if args.workers == 1:
+        serve(args.address, args.backend)
+    else:
+        processes = [
+            Process(target=serve, args=(f"{args.address}.{i}", args.backend), daemon=True)
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from Backend.app.database import SessionLocal
+from Backend.app.utils.utils import get_password_hash, verify_password
+import asyncio
+import math
+import threading
+import time
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many login attempts in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """bcrypt on its own small thread pool with a bounded queue.
+
+    A bcrypt call is hundreds of milliseconds of CPU. Running it here
+    rather than in the request threadpool means a login burst (or a
+    credential-stuffing run) queues behind other logins, not in front of
+    uploads and downloads. Beyond `max_queue` waiting calls it fails fast
+    with HashingBusy.
+
+    Logins for unknown usernames check the password against a dummy hash
+    (`reject_unknown`) through the same queue and pool. They wait, and get
+    HashingBusy, exactly like real ones, so neither the response time nor a
+    429 reveals whether the name exists.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 32):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.unknown_rejected = 0
+        self.busy_rejected = 0
+        self._dummy_hash, self._verify_time = self._calibrate()
+
+    @staticmethod
+    def _calibrate() -> tuple:
+        # A hash at the configured cost for unknown users to be checked against, and its timing
+        hashed = get_password_hash("calibration")
+        start = time.perf_counter()
+        verify_password("calibration", hashed)
+        return hashed, time.perf_counter() - start
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._pending / self.workers * self._verify_time))
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.busy_rejected += 1
+                raise HashingBusy(self._retry_after())
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return asyncio.wrap_future(future)
+
+    def _timed_verify(self, password: str, hashed: str) -> bool:
+        start = time.perf_counter()
+        ok = verify_password(password, hashed)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._verify_time = 0.9 * self._verify_time + 0.1 * elapsed
+            self.verified += 1
+        return ok
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._submit(get_password_hash, password)
+        with self._lock:
+            self.hashed += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(self._timed_verify, password, hashed)
+
+    async def reject_unknown(self, password: str):
+        """Spend a real check on an unknown username; raises HashingBusy like `verify`."""
+        await self._submit(verify_password, password, self._dummy_hash)
+        with self._lock:
+            self.unknown_rejected += 1
+
+    async def upgrade(self, model, row_id: int, password: str):
+        """Background task: re-hash a just-verified password at the current cost and store it."""
+        try:
+            hashed = await self.hash(password)
+        except HashingBusy:
+            # Try again on a later login
+            return
+
+        def store():
+            db = SessionLocal()
+            try:
+                db.query(model).filter(model.id == row_id).update({"password": hashed})
+                db.commit()
+            finally:
+                db.close()
+        await asyncio.to_thread(store)
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "avg_verify_ms": round(self._verify_time * 1000, 2),
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "unknown_rejected": self.unknown_rejected,
+            "busy_rejected": self.busy_rejected,
+        }
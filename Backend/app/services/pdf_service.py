@@ -4,96 +4,284 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+import multiprocessing
+import threading
+import copy
+import io
 import re
 import os
+import time
+import logging
 
 from sqlalchemy import table
 
-class PDFReportService:
-    def _render_explanation(self, text: str, styles) -> list:
-        """Convert markdown-style LLM text to ReportLab elements."""
-        elements = []
+logger = logging.getLogger(__name__)
+
+BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+BULLET_PATTERN = re.compile(r'^\* ')
+NUMBERED_PATTERN = re.compile(r'^\d+\.')
+
+FALLBACK_RECOMMENDATIONS = {
+    'High': [
+        "Visit dentist within 1 week",
+        "Avoid chewing on affected side",
+        "Maintain oral hygiene",
+    ],
+    'Medium': [
+        "Schedule dental appointment soon",
+        "Monitor for any pain or sensitivity",
+        "Brush twice daily with fluoride toothpaste",
+    ],
+    'Low': [
+        "Discuss at next regular checkup",
+        "Continue good oral hygiene",
+        "Limit sugary foods and drinks",
+    ],
+}
 
-        bullet_style = ParagraphStyle(
+
+class ReportTemplate:
+    """Everything in a report that doesn't depend on the patient, built once.
+
+    Holds the stylesheet, paragraph and table styles, and the parsed
+    flowables for fixed text (titles, headings, fallback recommendations,
+    footer). Flowables keep layout state once a document is built, so
+    `static()` hands out a shallow copy per render; the parsed text is
+    shared.
+    """
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.normal = self.styles['Normal']
+        self.italic = self.styles['Italic']
+
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#2c3e50'),
+            alignment=TA_CENTER,
+            spaceAfter=30
+        )
+        self.heading_style = ParagraphStyle(
+            'Heading2',
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#34495e'),
+            spaceAfter=12,
+            spaceBefore=20
+        )
+        self.bullet_style = ParagraphStyle(
             'BulletItem',
-            parent=styles['Normal'],
+            parent=self.normal,
             leftIndent=20,
             spaceAfter=4,
         )
-        numbered_style = ParagraphStyle(
+        self.numbered_style = ParagraphStyle(
             'NumberedItem',
-            parent=styles['Normal'],
+            parent=self.normal,
             leftIndent=10,
             spaceBefore=10,
             spaceAfter=4,
         )
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+
+        self._static = {
+            'title': Paragraph("Welcome to Teledent AI", self.title_style),
+            'series_title': Paragraph("Teledent AI Series Report", self.title_style),
+            'results_heading': Paragraph("Analysis Results", self.heading_style),
+            'details_heading': Paragraph("Detailed Analysis", self.heading_style),
+            'recommendations_heading': Paragraph("Recommendations", self.heading_style),
+            'summary_heading': Paragraph("AI Analysis Summary", self.heading_style),
+            'overview_heading': Paragraph("Series Overview", self.heading_style),
+            'thanks': Paragraph(
+                "Thank you for choosing Teledent AI for your dental health analysis.",
+                self.italic
+            ),
+            'disclaimer': Paragraph(
+                "This report is AI-generated and should be reviewed by a dental professional.",
+                self.italic
+            ),
+        }
+        self._fallbacks = {
+            risk: [Paragraph(f"• {rec}", self.normal) for rec in recs]
+            for risk, recs in FALLBACK_RECOMMENDATIONS.items()
+        }
 
-        def md_to_html(line: str) -> str:
-            # Convert **text** to <b>text</b>
-            return re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', line)
+    def static(self, name: str):
+        return copy.copy(self._static[name])
 
-        lines = text.split('\n')
-        for line in lines:
+    def fallback_recommendations(self, risk: str) -> list:
+        # Anything other than High/Medium gets the low-risk advice, as before
+        return [copy.copy(p) for p in self._fallbacks.get(risk, self._fallbacks['Low'])]
+
+    @staticmethod
+    def md_to_html(line: str) -> str:
+        # Convert **text** to <b>text</b>
+        return BOLD_PATTERN.sub(r'<b>\1</b>', line)
+
+    def render_explanation(self, text: str) -> list:
+        """Convert markdown-style LLM text to ReportLab elements."""
+        elements = []
+        for line in text.split('\n'):
             line = line.strip()
             if not line:
                 elements.append(Spacer(1, 6))
-            elif re.match(r'^\* ', line):  # bullet point
-                content = md_to_html(line[2:])
-                elements.append(Paragraph(f'• {content}', bullet_style))
-            elif re.match(r'^\d+\.', line):  # numbered item
-                content = md_to_html(line)
-                elements.append(Paragraph(content, numbered_style))
+            elif BULLET_PATTERN.match(line):  # bullet point
+                content = self.md_to_html(line[2:])
+                elements.append(Paragraph(f'• {content}', self.bullet_style))
+            elif NUMBERED_PATTERN.match(line):  # numbered item
+                content = self.md_to_html(line)
+                elements.append(Paragraph(content, self.numbered_style))
             else:
-                content = md_to_html(line)
-                elements.append(Paragraph(content, styles['Normal']))
+                content = self.md_to_html(line)
+                elements.append(Paragraph(content, self.normal))
                 elements.append(Spacer(1, 4))
-
         return elements
 
-    def generate_report(self, patient_name: str, analysis_data: dict, filename: str):
+
+# Per-process service used by pool workers, so each worker builds its template once
+_worker_service = None
+
+
+def _init_worker():
+    global _worker_service
+    _worker_service = PDFReportService(workers=0)
+
+
+def _render_in_worker(method: str, kwargs: dict) -> bytes:
+    buffer = io.BytesIO()
+    getattr(_worker_service, method)(filename=buffer, **kwargs)
+    return buffer.getvalue()
+
+
+class PDFReportService:
+    """Renders patient reports with ReportLab.
+
+    `generate_report`/`generate_series_report` write to a path or file
+    object in the calling thread. `render_report`/`render_series_report`
+    return the PDF as bytes; with `workers` > 0 they run in a bounded
+    process pool, so the CPU-bound layout work doesn't hold the GIL of the
+    web worker that's also serving requests and running inference.
+    """
+
+    def __init__(self, template: ReportTemplate = None, workers: int = None, timeout: float = None):
+        self.template = template or ReportTemplate()
+        self.workers = int(os.getenv("PDF_RENDER_WORKERS", "2")) if workers is None else workers
+        self.timeout = float(os.getenv("PDF_RENDER_TIMEOUT", "30")) if timeout is None else timeout
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.rendered = 0
+        self.failures = 0
+        self.pool_restarts = 0
+        self._render_ms = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: the parent has model and server threads that must not be copied mid-flight
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def _render(self, method: str, **kwargs) -> bytes:
+        start = time.time()
+        try:
+            if self.workers > 0:
+                pool = self._get_pool()
+                try:
+                    data = pool.submit(_render_in_worker, method, kwargs).result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed); start a fresh pool for the next render
+                    with self._pool_lock:
+                        if self._pool is pool:
+                            self._pool = None
+                            self.pool_restarts += 1
+                    pool.shutdown(wait=False)
+                    raise
+            else:
+                buffer = io.BytesIO()
+                getattr(self, method)(filename=buffer, **kwargs)
+                data = buffer.getvalue()
+        except Exception:
+            with self._stats_lock:
+                self.failures += 1
+            raise
+
+        with self._stats_lock:
+            self.rendered += 1
+            self._render_ms += (time.time() - start) * 1000
+        return data
+
+    def render_report(self, patient_name: str, analysis_data: dict, generated_at: datetime = None) -> bytes:
+        return self._render("generate_report", patient_name=patient_name,
+                            analysis_data=analysis_data, generated_at=generated_at)
+
+    def render_series_report(self, patient_name: str, items: list) -> bytes:
+        return self._render("generate_series_report", patient_name=patient_name, items=items)
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            rendered = self.rendered
+            render_ms = self._render_ms
+        return {
+            "workers": self.workers,
+            "pool_started": self._pool is not None,
+            "rendered": rendered,
+            "failures": self.failures,
+            "pool_restarts": self.pool_restarts,
+            "avg_render_ms": round(render_ms / rendered, 1) if rendered else None,
+        }
+
+    def generate_report(self, patient_name: str, analysis_data: dict, filename: str, generated_at: datetime = None):
     
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        styles = getSampleStyleSheet()
+        doc = SimpleDocTemplate(filename, pagesize=A4, invariant=1)
+        template = self.template
+        normal = template.normal
         elements = []
     
-        title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        alignment=TA_CENTER,
-        spaceAfter=30
-        )
-    
-        heading_style = ParagraphStyle(
-        'Heading2',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#34495e'),
-        spaceAfter=12,
-        spaceBefore=20
-        )
-    
-        elements.append(Paragraph("Welcome to Teledent AI", title_style))
-        elements.append(Paragraph(f"Patient: {patient_name}", styles['Normal']))
-        elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
+        elements.append(template.static('title'))
+        elements.append(Paragraph(f"Patient: {patient_name}", normal))
+        elements.append(Paragraph(f"Date: {(generated_at or datetime.now()).strftime('%Y-%m-%d %H:%M')}", normal))
         elements.append(Spacer(1, 30))
     
     # Analysis Results
-        elements.append(Paragraph("Analysis Results", heading_style))
+        elements.append(template.static('results_heading'))
     
     # Primary finding
         primary = analysis_data['primary_finding']
         elements.append(Paragraph(
         f"<b>Primary Finding:</b> {primary['condition']} "
         f"(Confidence: {primary['confidence_percentage']}% - {primary['level']})",
-        styles['Normal']
+        normal
         ))
         elements.append(Spacer(1, 20))
     
     # All diseases table
-        elements.append(Paragraph("Detailed Analysis", heading_style))
+        elements.append(template.static('details_heading'))
     
     # Table data
         table_data = [['Disease', 'Confidence', 'Risk Level']]
@@ -105,22 +293,12 @@ class PDFReportService:
             ])
     
         table = Table(table_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-    
+        table.setStyle(template.table_style)
         elements.append(table)
         elements.append(Spacer(1, 30))
     
     # Recommendations - USE THE ONES FROM EXPLANATION
-        elements.append(Paragraph("Recommendations", heading_style))
+        elements.append(template.static('recommendations_heading'))
     
         # Get recommendations from explanation
         explanation = analysis_data.get('explanation', {})
@@ -128,43 +306,72 @@ class PDFReportService:
     
         if recommendations:
             for rec in recommendations:
-                elements.append(Paragraph(f"• {rec}", styles['Normal']))
+                elements.append(Paragraph(f"• {rec}", normal))
                 elements.append(Spacer(1, 6))
         else:
         # Fallback recommendations based on risk level
-            risk = analysis_data['primary_finding']['level']
-            if risk == 'High':
-                elements.append(Paragraph("• Visit dentist within 1 week", styles['Normal']))
-                elements.append(Paragraph("• Avoid chewing on affected side", styles['Normal']))
-                elements.append(Paragraph("• Maintain oral hygiene", styles['Normal']))
-            elif risk == 'Medium':
-                elements.append(Paragraph("• Schedule dental appointment soon", styles['Normal']))
-                elements.append(Paragraph("• Monitor for any pain or sensitivity", styles['Normal']))
-                elements.append(Paragraph("• Brush twice daily with fluoride toothpaste", styles['Normal']))
-            else:
-                elements.append(Paragraph("• Discuss at next regular checkup", styles['Normal']))
-                elements.append(Paragraph("• Continue good oral hygiene", styles['Normal']))
-                elements.append(Paragraph("• Limit sugary foods and drinks", styles['Normal']))
+            elements.extend(template.fallback_recommendations(primary['level']))
     
         elements.append(Spacer(1, 30))
     
         if explanation and explanation.get('explanation'):
-            elements.append(Paragraph("AI Analysis Summary", heading_style))
-            elements.extend(self._render_explanation(explanation['explanation'], styles))
+            elements.append(template.static('summary_heading'))
+            elements.extend(template.render_explanation(explanation['explanation']))
             elements.append(Spacer(1, 20))
     
     # Footer
-            elements.append(Paragraph(
-            "Thank you for choosing Teledent AI for your dental health analysis.",
-            styles['Italic']
-            ))
+            elements.append(template.static('thanks'))
         elements.append(Spacer(1, 12))
-        elements.append(Paragraph(
-        "This report is AI-generated and should be reviewed by a dental professional.",
-        styles['Italic']
-        ))
+        elements.append(template.static('disclaimer'))
     
     # Build PDF
         doc.build(elements)
         return filename
-    
\ No newline at end of file
+
+    def generate_series_report(self, patient_name: str, items: list, filename: str):
+        """One combined report for a series of images; `items` hold the per-image report data."""
+        doc = SimpleDocTemplate(filename, pagesize=A4, invariant=1)
+        template = self.template
+        normal = template.normal
+        elements = []
+
+        elements.append(template.static('series_title'))
+        elements.append(Paragraph(f"Patient: {patient_name}", normal))
+        elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", normal))
+        elements.append(Paragraph(f"Images analyzed: {len(items)}", normal))
+        elements.append(Spacer(1, 30))
+
+        # Overview of every image in the series
+        elements.append(template.static('overview_heading'))
+        table_data = [['Image', 'Primary Finding', 'Confidence', 'Risk Level']]
+        for item in items:
+            primary = item['primary_finding']
+            table_data.append([
+                item['image_name'],
+                primary['condition'],
+                f"{primary['confidence_percentage']}%",
+                primary['level']
+            ])
+        table = Table(table_data, colWidths=[2*inch, 1.8*inch, 1.2*inch, 1.2*inch])
+        table.setStyle(template.table_style)
+        elements.append(table)
+
+        # Per-image details
+        for index, item in enumerate(items, start=1):
+            primary = item['primary_finding']
+            elements.append(Paragraph(f"Image {index}: {item['image_name']}", template.heading_style))
+            elements.append(Paragraph(
+                f"<b>Primary Finding:</b> {primary['condition']} "
+                f"(Confidence: {primary['confidence_percentage']}% - {primary['level']})",
+                normal
+            ))
+            elements.append(Spacer(1, 10))
+            for rec in item.get('explanation', {}).get('recommendations', []) or []:
+                elements.append(Paragraph(f"• {rec}", normal))
+                elements.append(Spacer(1, 6))
+
+        elements.append(Spacer(1, 30))
+        elements.append(template.static('disclaimer'))
+
+        doc.build(elements)
+        return filename
@@ -0,0 +1,140 @@
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from Backend.app.models.patient import Patient
+from Backend.app.services import providers
+from Backend.app.services.cache_service import LRUCache
+from Backend.app.utils.utils import verify_token
+import time
+
+
+class Principal:
+    """The few fields request handlers need from an authenticated patient or admin."""
+
+    __slots__ = ("id", "username", "email", "is_active")
+
+    def __init__(self, id: int, username: str, email: str, is_active: bool = True):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.username, row.email, getattr(row, "is_active", True))
+
+
+class PrincipalCache:
+    """Per-process memo of verified tokens and of the account each one names.
+
+    A decoded JWT payload is kept until the token expires, so a signature
+    is checked once per token per worker, not once per request. Principals
+    are keyed on (kind, username) and live for `ttl` seconds. When a
+    transaction that deletes a patient or changes their `is_active` or
+    `username` commits, this worker evicts them. That includes bulk
+    `query(Patient).update()` and `.delete()`: the rows they match are
+    looked up first. Other workers catch up within `ttl`.
+    """
+
+    def __init__(self, ttl: float = 30, maxsize: int = 4096):
+        self.ttl = ttl
+        self.tokens = LRUCache(maxsize=maxsize)
+        self.principals = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def decode(self, token: str):
+        """verify_token, memoized for the token's lifetime."""
+        if not token:
+            return None
+        payload = self.tokens.get(token)
+        if payload is None:
+            payload = verify_token(token)
+            if payload is None:
+                return None
+            remaining = payload.get("exp", 0) - time.time()
+            if remaining > 0:
+                self.tokens.set(token, payload, ttl=remaining)
+        return payload
+
+    def get(self, kind: str, username: str):
+        return self.principals.get((kind, username))
+
+    def put(self, kind: str, row) -> Principal:
+        principal = Principal.from_row(row)
+        self.principals.set((kind, principal.username), principal)
+        return principal
+
+    def evict(self, kind: str, username: str):
+        self.principals.pop((kind, username))
+
+    def evict_kind(self, kind: str):
+        self.principals.discard_where(lambda key: key[0] == kind)
+
+    def stats(self) -> dict:
+        return {
+            "ttl_seconds": self.ttl,
+            "tokens": self.tokens.stats(),
+            "principals": self.principals.stats(),
+        }
+
+
+# Collected at flush, acted on at commit: a rolled-back change never evicts anything
+_PENDING = "principals_to_evict"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_patients(session, flush_context):
+    pending = session.info.setdefault(_PENDING, set())
+    for obj in session.deleted:
+        if isinstance(obj, Patient) and obj.username:
+            pending.add(obj.username)
+    for obj in session.dirty:
+        if isinstance(obj, Patient) and obj.username:
+            state = inspect(obj)
+            if state.attrs.is_active.history.has_changes():
+                pending.add(obj.username)
+            # A renamed account is cached under its old name
+            pending.update(name for name in state.attrs.username.history.deleted if name)
+
+
+# The Patient columns a Principal is built from and checked against
+_PRINCIPAL_COLUMNS = {"is_active", "username"}
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_patient_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete) or not any(
+        mapper.class_ is Patient for mapper in orm_execute_state.all_mappers
+    ):
+        return
+    statement = orm_execute_state.statement
+    pending = orm_execute_state.session.info.setdefault(_PENDING, set())
+    if orm_execute_state.is_update:
+        if not statement._values:
+            # Bulk update by primary key (parameters per row): can't tell cheaply, so drop everyone
+            pending.add(None)
+            return
+        if not {getattr(column, "key", column) for column in statement._values} & _PRINCIPAL_COLUMNS:
+            # e.g. PasswordHasher.upgrade storing a rehashed password
+            return
+    # The rows the statement is about to change, read with its own criteria
+    usernames = select(Patient.username)
+    if statement.whereclause is not None:
+        usernames = usernames.where(statement.whereclause)
+    pending.update(orm_execute_state.session.scalars(usernames))
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_patients(session):
+    pending = session.info.pop(_PENDING, None)
+    cache = providers.loaded("principals")
+    if not pending or cache is None:
+        return
+    if None in pending:
+        cache.evict_kind("patient")
+        return
+    for username in pending:
+        cache.evict("patient", username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_patients(session):
+    session.info.pop(_PENDING, None)
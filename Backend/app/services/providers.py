@@ -0,0 +1,169 @@
+"""Lazily built, process-wide service instances.
+
+Importing this module is cheap: torch, transformers, langchain and
+reportlab are only imported when the corresponding service is first
+requested, so admin-only traffic never pays for them.
+"""
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_creation_locks = {}
+_instances = {}
+_model_state = {"status": "not_loaded", "error": None, "load_time_ms": None}
+
+
+def _get_or_create(name: str, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        # One lock per service so a slow model load doesn't block the others
+        with _lock:
+            creation_lock = _creation_locks.setdefault(name, threading.Lock())
+        with creation_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+
+def loaded(name: str):
+    """Return the instance if it was already built, without building it."""
+    return _instances.get(name)
+
+
+def _create_vision_service(status: str = "ready"):
+    from Backend.app.services.vision_service import DentalVisionService
+
+    _model_state["status"] = "loading"
+    start = time.time()
+    try:
+        service = DentalVisionService()
+    except Exception as e:
+        _model_state.update(status="failed", error=str(e))
+        raise
+    _model_state.update(status=status, error=None, load_time_ms=round((time.time() - start) * 1000, 2))
+    return service
+
+
+def get_vision_service():
+    # Loaded on demand (warm-up failed or hasn't run): it serves straight away, so it is ready
+    return _get_or_create("vision", _create_vision_service)
+
+
+def get_explanation_service():
+    from Backend.app.services.explanation_service import ExplanationService
+    return _get_or_create("explanation", ExplanationService)
+
+
+def get_pdf_service():
+    from Backend.app.services.pdf_service import PDFReportService
+    return _get_or_create("pdf", PDFReportService)
+
+
+def get_password_hasher():
+    from Backend.app.services.password_service import PasswordHasher
+    return _get_or_create("password_hasher", lambda: PasswordHasher(
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+        max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+    ))
+
+
+def get_principal_cache():
+    from Backend.app.services.principal_service import PrincipalCache
+    return _get_or_create("principals", lambda: PrincipalCache(
+        ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "30")),
+        maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+    ))
+
+
+def get_analysis_cache():
+    from Backend.app.services.analysis_cache_service import AnalysisCacheService
+    return _get_or_create("analysis_cache", lambda: AnalysisCacheService(
+        model_name=get_vision_service().model_id,
+        maxsize=int(os.getenv("ANALYSIS_CACHE_SIZE", "2048"))
+    ))
+
+
+def get_admission_controller():
+    from Backend.app.services.admission_service import AdmissionController
+    return _get_or_create("admission", lambda: AdmissionController(
+        max_concurrent=int(os.getenv("INFERENCE_MAX_CONCURRENT", "8")),
+        max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "64")),
+        max_queue_per_key=int(os.getenv("INFERENCE_MAX_QUEUE_PER_PATIENT", "16")),
+        max_wait=float(os.getenv("INFERENCE_MAX_WAIT", "10"))
+    ))
+
+
+def get_report_cache():
+    from Backend.app.services.disk_cache_service import DiskCache
+    return _get_or_create("report_cache", lambda: DiskCache(
+        # Not "reports": eviction would take the PDFs rendered there before this cache
+        os.getenv("REPORT_CACHE_DIR", "report_cache"),
+        max_bytes=int(os.getenv("REPORT_CACHE_MAX_MB", "500")) * 1024 * 1024,
+        suffix=".pdf"
+    ))
+
+
+def get_image_store():
+    from Backend.app.services.image_store_service import ImageStore
+    return _get_or_create("image_store", lambda: ImageStore(
+        os.getenv("IMAGE_STORE_DIR", "uploads/store"),
+        grace=float(os.getenv("IMAGE_GC_GRACE", "3600"))
+    ))
+
+
+def get_resumable_uploads():
+    from Backend.app.services.resumable_upload_service import ResumableUploads
+    # Under the store root so a finished upload is renamed into place, not copied
+    return _get_or_create("resumable_uploads", lambda: ResumableUploads(
+        os.path.join(get_image_store().root, ".partial"),
+        ttl=float(os.getenv("UPLOAD_SESSION_TTL", "86400"))
+    ))
+
+
+def _parse_variants(spec: str) -> list:
+    """'webp:256,jpeg:512' -> [(256, 'webp'), (512, 'jpeg')]"""
+    variants = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        fmt, width = item.split(":")
+        variants.append((int(width), fmt))
+    return variants
+
+
+def get_derivative_service():
+    from Backend.app.services.derivative_service import DerivativeService
+    from Backend.app.services.disk_cache_service import DiskCache
+    return _get_or_create("derivatives", lambda: DerivativeService(
+        DiskCache(
+            os.getenv("DERIVATIVE_CACHE_DIR", "derivatives"),
+            max_bytes=int(os.getenv("DERIVATIVE_CACHE_MAX_MB", "200")) * 1024 * 1024
+        ),
+        pregenerate=_parse_variants(os.getenv("DERIVATIVE_PREGENERATE", "webp:256"))
+    ))
+
+
+def warm_up():
+    """Build the remaining services and push one dummy batch through the model."""
+    try:
+        # "loaded" until the dummy batch has gone through
+        vision_service = _get_or_create("vision", lambda: _create_vision_service(status="loaded"))
+        vision_service.warm_up()
+        _model_state.update(status="ready", error=None)
+        logger.info("Vision model warmed up")
+    except Exception as e:
+        _model_state.update(status="failed", error=str(e))
+        logger.error(f"Vision model warm-up failed: {e}")
+
+    for factory in (get_explanation_service, get_pdf_service):
+        try:
+            factory()
+        except Exception as e:
+            logger.error(f"{factory.__name__} failed: {e}")
+
+
+def model_status() -> dict:
+    return dict(_model_state)
@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from Backend.app.database import SessionLocal
+from Backend.app.models.patient import UploadSession
+from Backend.app.services.upload_service import (
+    MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, UploadRejected, run_io, sniff_image_type
+)
+import os
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResumableUploads:
+    """Uploads sent as a sequence of chunks that can resume after a dropped connection.
+
+    `create` reserves a session and an empty `.part` file. Each chunk is
+    written straight into that file at its offset, and the session row
+    records how many leading bytes have arrived, including the part of a
+    chunk that made it before the connection broke. The client asks for
+    that offset and carries on from there. Once every byte is in, `claim`
+    marks the session complete and hands back the file. It then goes
+    through the normal upload flow and is moved (not copied) into the
+    image store.
+
+    The directory must be on the same filesystem as the image store.
+    Sessions idle for longer than `ttl` seconds are removed with their
+    files by `expire`.
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.created = 0
+        self.completed = 0
+        self.expired = 0
+        self.bytes_received = 0
+
+    def path_for(self, session_uuid: str) -> str:
+        return os.path.join(self.directory, f"{session_uuid}.part")
+
+    def create(self, db: Session, patient_id: int, original_name: str, size: int) -> UploadSession:
+        """Start a session (part of the caller's transaction)."""
+        if size <= 0:
+            raise UploadRejected("Empty upload")
+        if size > self.max_bytes:
+            raise UploadRejected(f"Image exceeds {self.max_bytes // (1024 * 1024)} MB", status_code=413)
+
+        session = UploadSession(
+            uuid=str(uuid.uuid4()),
+            patient_id=patient_id,
+            original_name=original_name,
+            size=size,
+            received=0,
+            status="open"
+        )
+        open(self.path_for(session.uuid), "wb").close()
+        db.add(session)
+        db.flush()
+        with self._lock:
+            self.created += 1
+        return session
+
+    def get(self, db: Session, patient_id: int, session_uuid: str) -> UploadSession:
+        session = db.query(UploadSession).filter(
+            UploadSession.uuid == session_uuid,
+            UploadSession.patient_id == patient_id
+        ).first()
+        if session is None:
+            raise UploadRejected("Upload not found", status_code=404)
+        return session
+
+    def check_chunk(self, session: UploadSession, offset: int):
+        """Reject a chunk that can't be written at `offset`."""
+        if session.status != "open":
+            raise UploadRejected("Upload already finalized", status_code=409)
+        # Resending bytes already received is fine; skipping ahead would leave a hole
+        if offset < 0 or offset > session.received:
+            raise UploadRejected(f"Expected offset {session.received}", status_code=409)
+        if not os.path.exists(self.path_for(session.uuid)):
+            raise UploadRejected("Upload expired", status_code=410)
+
+    async def write(self, session_uuid: str, offset: int, chunks, limit: int):
+        """Write the async iterable `chunks` into the part file from `offset`.
+
+        Yields the number of bytes written after each write, so the caller
+        can record progress even when the stream breaks partway. At most
+        `limit` bytes are accepted.
+        """
+        fd = await run_io(os.open, self.path_for(session_uuid), os.O_WRONLY)
+        position = offset
+        buffer = bytearray()
+
+        async def flush():
+            nonlocal position
+            # The first bytes decide the type, so a non-image is refused before it is sent in full
+            if position == 0 and len(buffer) >= 16 and sniff_image_type(bytes(buffer[:16])) is None:
+                raise UploadRejected("Only JPEG and PNG images allowed")
+            data = bytes(buffer)
+            buffer.clear()
+            await run_io(os.pwrite, fd, data, position)
+            position += len(data)
+            with self._lock:
+                self.bytes_received += len(data)
+            return len(data)
+
+        try:
+            try:
+                async for chunk in chunks:
+                    if position + len(buffer) + len(chunk) > offset + limit:
+                        raise UploadRejected("Chunk extends past the declared size", status_code=413)
+                    buffer += chunk
+                    if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                        yield await flush()
+            except UploadRejected:
+                raise
+            except Exception:
+                # The connection dropped: keep what did arrive so the client resumes after it
+                if buffer:
+                    yield await flush()
+                raise
+            if buffer:
+                yield await flush()
+        finally:
+            await run_io(os.close, fd)
+
+    def record(self, db: Session, session_uuid: str, end: int):
+        """Move the session's offset up to `end` (part of the caller's transaction)."""
+        db.query(UploadSession).filter(UploadSession.uuid == session_uuid).update(
+            {"received": func.greatest(UploadSession.received, end), "updated_at": func.now()},
+            synchronize_session=False
+        )
+
+    def claim(self, db: Session, patient_id: int, session_uuid: str) -> UploadSession:
+        """Mark a fully received session complete and return it; its file is then the caller's.
+
+        The status check and update are one statement, so a finalize that is
+        retried or sent twice only gets the file once.
+        """
+        claimed = db.query(UploadSession).filter(
+            UploadSession.uuid == session_uuid,
+            UploadSession.patient_id == patient_id,
+            UploadSession.status == "open",
+            UploadSession.received == UploadSession.size
+        ).update({"status": "complete", "updated_at": func.now()}, synchronize_session=False)
+
+        session = self.get(db, patient_id, session_uuid)
+        if not claimed:
+            if session.status != "open":
+                raise UploadRejected("Upload already finalized", status_code=409)
+            raise UploadRejected(
+                f"Upload incomplete: {session.received} of {session.size} bytes received", status_code=409
+            )
+        if not os.path.exists(self.path_for(session_uuid)):
+            raise UploadRejected("Upload expired", status_code=410)
+        with self._lock:
+            self.completed += 1
+        return session
+
+    def reopen(self, db: Session, session_uuid: str):
+        """Undo `claim` for an upload that was turned away before being stored (part of the caller's transaction)."""
+        db.query(UploadSession).filter(UploadSession.uuid == session_uuid).update(
+            {"status": "open", "updated_at": func.now()}, synchronize_session=False
+        )
+        with self._lock:
+            self.completed -= 1
+
+    def expire(self) -> dict:
+        """Delete sessions idle for longer than the TTL, and part files no session owns any more."""
+        db = SessionLocal()
+        removed = 0
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+            stale = db.query(UploadSession).filter(UploadSession.updated_at < cutoff).all()
+            for session in stale:
+                db.delete(session)
+                removed += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Covers the sessions above and files left behind by a failed create
+        stale_mtime = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < stale_mtime:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+        with self._lock:
+            self.expired += removed
+        if removed:
+            logger.info(f"Expired {removed} idle upload sessions")
+        return {"expired": removed}
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "ttl_seconds": self.ttl,
+            "created": self.created,
+            "completed": self.completed,
+            "expired": self.expired,
+            "bytes_received": self.bytes_received,
+        }
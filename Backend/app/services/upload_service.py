@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import os
+import uuid
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Upload file I/O gets its own threads so it never waits behind (or holds up) the request threadpool
+_io_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("UPLOAD_IO_WORKERS", "4")),
+    thread_name_prefix="upload-io"
+)
+
+# Magic bytes -> (mime type, extension the file is stored with)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+)
+
+
+class UploadRejected(ValueError):
+    """The upload failed validation; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def sniff_image_type(head: bytes):
+    """Return (mime type, extension) from the leading bytes, or None if it isn't a supported image."""
+    for signature, mime_type, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type, extension
+    return None
+
+
+def check_image(data: bytes, max_bytes: int = MAX_UPLOAD_BYTES) -> tuple:
+    """Validate an image that is already in memory; returns (mime type, extension)."""
+    if len(data) > max_bytes:
+        raise UploadRejected(f"Image exceeds {max_bytes // (1024 * 1024)} MB", status_code=413)
+    sniffed = sniff_image_type(data[:16])
+    if sniffed is None:
+        raise UploadRejected("Only JPEG and PNG images allowed")
+    return sniffed
+
+
+def ingest_upload(fileobj, staging_dir: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                  chunk_size: int = UPLOAD_CHUNK_SIZE) -> dict:
+    """Stage an uploaded image in `staging_dir` in a single read of the upload.
+
+    Each chunk is hashed (SHA-256), counted against `max_bytes` and written
+    to a hidden temp file; the type comes from the first bytes, not the
+    client's content type. Only a complete, valid file is returned as
+    `tmp_path`, for the image store to move into place (see ImageStore.add).
+    The chunks are joined once into the returned `data`, which io.BytesIO
+    can wrap without another copy for decoding.
+    """
+    os.makedirs(staging_dir, exist_ok=True)
+    image_uuid = str(uuid.uuid4())
+    tmp_path = os.path.join(staging_dir, f".{image_uuid}.tmp")
+
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    sniffed = None
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                if sniffed is None:
+                    sniffed = sniff_image_type(chunk[:16])
+                    if sniffed is None:
+                        raise UploadRejected("Only JPEG and PNG images allowed")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"Image exceeds {max_bytes // (1024 * 1024)} MB", status_code=413)
+                digest.update(chunk)
+                out.write(chunk)
+                chunks.append(chunk)
+
+        if sniffed is None:
+            raise UploadRejected("Empty upload")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    mime_type, extension = sniffed
+    return {
+        "uuid": image_uuid,
+        "filename": f"{image_uuid}{extension}",
+        "extension": extension,
+        "tmp_path": tmp_path,
+        "size": size,
+        "mime_type": mime_type,
+        "content_hash": digest.hexdigest(),
+        "data": b"".join(chunks),
+    }
+
+
+async def run_io(func, *args):
+    """Run blocking upload file I/O on the upload I/O executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, func, *args)
+
+
+async def aingest_upload(fileobj, staging_dir: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """ingest_upload on the upload I/O executor, for async endpoints."""
+    return await run_io(ingest_upload, fileobj, staging_dir, max_bytes)
+
+
+def ingest_staged(path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Validate and hash an upload that was already assembled at `path` (see ResumableUploads).
+
+    Returns the same fields as ingest_upload with `tmp_path` set to `path`
+    itself, so the image store moves the assembled file into place rather
+    than copying it.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    mime_type, extension = check_image(data, max_bytes)
+    image_uuid = str(uuid.uuid4())
+    return {
+        "uuid": image_uuid,
+        "filename": f"{image_uuid}{extension}",
+        "extension": extension,
+        "tmp_path": path,
+        "size": len(data),
+        "mime_type": mime_type,
+        "content_hash": hashlib.sha256(data).hexdigest(),
+        "data": data,
+    }
+
+
+async def aingest_staged(path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """ingest_staged on the upload I/O executor, for async endpoints."""
+    return await run_io(ingest_staged, path, max_bytes)
@@ -1,51 +1,151 @@
 from transformers import AutoImageProcessor, SiglipForImageClassification
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
+import numpy as np
 import torch
+import asyncio
 import io
+import os
 import time
 import logging
+from dotenv import load_dotenv
+from Backend.app.services.batching_service import BatchingInferenceQueue
+from Backend.app.services.preprocess_service import ImagePreprocessor
 
+load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "prithivMLmods/tooth-agenesis-siglip2"
+DEFAULT_ONNX_PATH = "exported_models/tooth-agenesis-siglip2.onnx"
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class TorchBackend:
+    """Eager PyTorch, optionally with dynamic int8 quantization of the Linear layers."""
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        self.name = "torch-int8" if quantize else "torch"
+        model = SiglipForImageClassification.from_pretrained(model_name)
+        model.eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def __call__(self, pixel_values: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            outputs = self.model(pixel_values=torch.from_numpy(pixel_values))
+            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+        return probs.numpy()
+
+
+class OnnxBackend:
+    """ONNX Runtime session over a graph produced by `Backend.app.scripts.export_onnx`."""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {onnx_path}; run `python -m Backend.app.scripts.export_onnx` first"
+            )
+
+        options = ort.SessionOptions()
+        threads = int(os.getenv("VISION_ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, pixel_values: np.ndarray) -> np.ndarray:
+        logits = self.session.run(None, {self.input_name: pixel_values.astype(np.float32)})[0]
+        return softmax(logits)
+
+
+def create_backend(name: str, model_name: str = MODEL_NAME):
+    if name == "torch":
+        return TorchBackend(model_name)
+    if name == "torch-int8":
+        return TorchBackend(model_name, quantize=True)
+    if name == "onnx":
+        return OnnxBackend(os.getenv("VISION_ONNX_PATH", DEFAULT_ONNX_PATH))
+    if name == "remote":
+        # Weights live in the shared model server, not in this process
+        from Backend.app.services.model_server import RemoteBackend
+        return RemoteBackend()
+    raise ValueError(f"Unknown vision backend: {name}")
+
+
 class DentalVisionService:
-    def __init__(self):
-        self.model_name = "prithivMLmods/tooth-agenesis-siglip2"
+    def __init__(self, backend: str = None):
+        self.model_name = MODEL_NAME
         self.class_names = [
-            'Calculus', 'Caries', 'Gingivitis', 
+            'Calculus', 'Caries', 'Gingivitis',
             'Mouth Ulcer', 'Tooth Discoloration', 'Hypodontia'
         ]
-        
-        logger.info("Loading dental AI model...")
+
+        backend = backend or os.getenv("VISION_BACKEND", "torch")
+        logger.info(f"Loading dental AI model ({backend} backend)...")
         self.processor = AutoImageProcessor.from_pretrained(self.model_name)
-        self.model = SiglipForImageClassification.from_pretrained(self.model_name)
-        self.model.eval()
+        self.preprocessor = ImagePreprocessor(self.processor)
+        self.fast_preprocess = os.getenv("VISION_FAST_PREPROCESS", "true").lower() == "true"
+        self.backend = create_backend(backend, self.model_name)
         logger.info("Model loaded successfully!")
-    
-    def analyze(self, image_bytes: bytes):
-        start = time.time()
-        
+
+        # Results differ slightly between backends, so caches key on both
+        self.model_id = f"{self.model_name}:{self.backend.name}"
+
+        # Concurrent analyze() calls share one forward pass
+        self.batcher = BatchingInferenceQueue(
+            self._run_batch,
+            max_batch_size=int(os.getenv("VISION_MAX_BATCH_SIZE", "8")),
+            max_wait_ms=float(os.getenv("VISION_MAX_WAIT_MS", "10")),
+            name="vision"
+        )
+        # Decode/preprocess for async callers; bounded so a burst of uploads can't take every core
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("VISION_EXECUTOR_WORKERS", "4")),
+            thread_name_prefix="vision"
+        )
+
+    def _prepare(self, image_bytes: bytes) -> np.ndarray:
+        if self.fast_preprocess:
+            return self.preprocessor(image_bytes)
+        return self._prepare_reference(image_bytes)
+
+    def _prepare_reference(self, image_bytes: bytes) -> np.ndarray:
         # Convert to PIL Image
         image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        
+
         # Prepare for model
-        inputs = self.processor(images=image, return_tensors="pt")
-        
+        inputs = self.processor(images=image, return_tensors="np")
+        return inputs["pixel_values"]
+
+    def _run_batch(self, pixel_values: list) -> list:
+        batch = np.concatenate(pixel_values, axis=0)
+
         # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        
+        probs = self.backend(batch)
+        return list(probs)
+
+    def _format_result(self, probs: np.ndarray, start: float):
         # Get results
-        predicted = torch.argmax(probs, dim=-1).item()
-        confidence = probs[0][predicted].item()
-        
+        predicted = int(np.argmax(probs))
+        confidence = float(probs[predicted])
+
         # All probabilities
         all_probs = {
-            name: float(probs[0][i]) 
+            name: float(probs[i])
             for i, name in enumerate(self.class_names)
         }
-        
+
         return {
             "success": True,
             "top_prediction": {
@@ -54,4 +154,55 @@ class DentalVisionService:
             },
             "all_probabilities": all_probs,
             "processing_time_ms": round((time.time() - start) * 1000, 2)
-        }
\ No newline at end of file
+        }
+
+    def analyze(self, image_bytes: bytes):
+        start = time.time()
+        pixel_values = self._prepare(image_bytes)
+        probs = self.batcher.submit(pixel_values).result()
+        return self._format_result(probs, start)
+
+    async def aanalyze(self, image_bytes: bytes):
+        """analyze() for async callers: preprocessing runs on the service's
+        executor and the forward pass on the batcher thread, awaited without
+        blocking the event loop."""
+        start = time.time()
+        loop = asyncio.get_running_loop()
+        pixel_values = await loop.run_in_executor(self.executor, self._prepare, image_bytes)
+        probs = await asyncio.wrap_future(self.batcher.submit(pixel_values))
+        return self._format_result(probs, start)
+
+    def analyze_batch(self, images: list):
+        """Analyze several images together.
+
+        All images are queued up front so they share batches; results are
+        yielded in input order as soon as each one is ready. A failed image
+        yields {"success": False, "error": ...} instead of raising.
+        """
+        start = time.time()
+        futures = []
+        for image_bytes in images:
+            try:
+                futures.append(self.batcher.submit(self._prepare(image_bytes)))
+            except Exception as e:
+                futures.append(e)
+
+        for future in futures:
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                yield self._format_result(future.result(), start)
+            except Exception as e:
+                yield {"success": False, "error": str(e)}
+
+    def warm_up(self):
+        """Run one dummy batch so the first real request doesn't pay for lazy init."""
+        width, height = self.preprocessor.size
+        self.batcher.submit(np.zeros((1, 3, height, width), dtype=np.float32)).result()
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_id,
+            "executor_workers": self.executor._max_workers,
+            "batching": self.batcher.stats()
+        }
@@ -0,0 +1,74 @@
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from dotenv import load_dotenv
+from urllib.parse import quote
+import hashlib
+import os
+
+load_dotenv()
+
+# Content that never changes under its URL (original images, variants, series reports)
+IMMUTABLE = "private, max-age=31536000, immutable"
+# Content that can change under its URL (analysis reports) and must be revalidated each time
+REVALIDATE = "private, no-cache"
+
+# "" streams files from Python; "x-accel" (nginx) or "x-sendfile" (Apache/lighttpd) hand them to the proxy
+SENDFILE_MODE = os.getenv("FILE_SENDFILE_MODE", "").lower()
+# nginx `internal` location that maps onto the app's working directory
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/protected/")
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from whatever identifies the exact bytes (content hash, variant key, ...)."""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def _headers(etag: str, cache_control: str, filename: str = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if filename:
+        # Same form FileResponse(filename=...) uses
+        quoted = quote(filename)
+        if quoted != filename:
+            headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return headers
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers=_headers(etag, cache_control))
+
+
+def cached_file_response(path: str, media_type: str, etag: str, cache_control: str,
+                         filename: str = None) -> Response:
+    """Serve a file with validators; Starlette's FileResponse handles Range/If-Range requests.
+
+    In sendfile mode the body is left to the proxy and Python only answers
+    with headers, after the caller has done the authorization check.
+    """
+    headers = _headers(etag, cache_control, filename)
+    if SENDFILE_MODE == "x-accel":
+        headers["X-Accel-Redirect"] = X_ACCEL_PREFIX + quote(os.path.relpath(path).replace(os.sep, "/"))
+        return Response(media_type=media_type, headers=headers)
+    if SENDFILE_MODE == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(path)
+        return Response(media_type=media_type, headers=headers)
+    return FileResponse(path=path, media_type=media_type, headers=headers)
+
+
+def cached_bytes_response(data: bytes, media_type: str, etag: str, cache_control: str,
+                          filename: str = None) -> Response:
+    """Serve content that was just rendered in memory, with the same validators as the file would get."""
+    return Response(content=data, media_type=media_type, headers=_headers(etag, cache_control, filename))